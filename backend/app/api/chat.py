@@ -1,17 +1,20 @@
 from typing import Optional
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
 import time
 import json
-from sqlalchemy import select, delete  # Add proper imports
+from sqlalchemy import select, delete, insert, update, tuple_  # Add proper imports
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.pagination import decode_cursor, encode_cursor
 from app.models.chat_models import ChatRequest
 from app.services import neon_service, tavily_service, gemini_service, embedding_service
 from app.models import db_models
 from app.api import auth # Import your auth dependency/function
-from app.services import chat_service
+from app.services.auth_service import AuthenticatedUser
+from app.services import chat_service, quota_service, history_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,28 +27,27 @@ async def chat_stream_endpoint(
     chat_req: ChatRequest,
     request: Request,
     db: Session = Depends(get_db),
-    current_user: Optional[db_models.User] = Depends(auth.get_optional_current_user)
+    current_user: Optional[AuthenticatedUser] = Depends(auth.get_optional_current_user)
 ):
     """Chat stream endpoint that works for both authenticated and anonymous users."""
-    # Check anonymous message limit if user is not authenticated
+    # Anonymous users get a message quota; the hit is counted here, before any upstream work starts
+    anonymous_session_id = None
+    anonymous_message_count = None
     if not current_user:
         # Get anonymous session from cookies or create one
-        anonymous_session_id = request.cookies.get("anonymous_session_id")
-        
-        if not anonymous_session_id:
-            # First message from this anonymous user
-            anonymous_session_id = str(uuid.uuid4())
-        else:
-            # Check message count for this anonymous session
-            message_count = await chat_service.get_anonymous_message_count(db, anonymous_session_id)
-            if message_count >= 3:
-                # Limit reached, return 403 error
-                raise HTTPException(
-                    status_code=403,
-                    detail="Message limit reached for anonymous users. Please sign in to continue chatting."
-                )
-    
-    response = await chat_service.chat_stream_handler(chat_req, request, db, current_user, anonymous_session_id if not current_user else None)
+        anonymous_session_id = request.cookies.get("anonymous_session_id") or str(uuid.uuid4())
+        decision = await quota_service.get_anonymous_quota().hit(anonymous_session_id)
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=403,
+                detail="Message limit reached for anonymous users. Please sign in to continue chatting.",
+                headers={"Retry-After": str(int(decision.retry_after) + 1)}
+            )
+        anonymous_message_count = decision.used - 1  # Messages sent before this one
+
+    response = await chat_service.chat_stream_handler(
+        chat_req, request, db, current_user, anonymous_session_id, anonymous_message_count
+    )
     
     # If anonymous user, set cookie with session ID
     if not current_user:
@@ -61,93 +63,140 @@ async def chat_stream_endpoint(
 
 
 @router.get("/sessions", response_model=list[dict]) 
-async def list_chat_sessions(db: Session = Depends(get_db), current_user: db_models.User = Depends(auth.get_current_user)):
-    """Lists all chat sessions for the current user."""
-    # Use a join with GROUP BY to efficiently get session counts in a single query
-    from sqlalchemy import func
-    
+async def list_chat_sessions(
+    response: Response,
+    limit: int = Query(settings.CHAT_SESSIONS_PAGE_SIZE, ge=1, le=settings.CHAT_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
+):
+    """Lists the current user's chat sessions, newest first, one keyset page at a time.
+
+    When more sessions exist, the cursor for the next page is returned in the X-Next-Cursor header.
+    """
     query = select(
         db_models.ChatSession.id,
         db_models.ChatSession.name,
         db_models.ChatSession.created_at,
-        func.count(db_models.ChatMessage.id).label('message_count')
-    ).outerjoin(
-        db_models.ChatMessage, 
-        db_models.ChatSession.id == db_models.ChatMessage.session_id
+        db_models.ChatSession.message_count,
+        db_models.ChatSession.last_message_at
     ).where(
         db_models.ChatSession.user_id == current_user.id
-    ).group_by(
-        db_models.ChatSession.id
-    ).order_by(db_models.ChatSession.created_at.desc())
-    
+    ).order_by(
+        db_models.ChatSession.created_at.desc(), db_models.ChatSession.id.desc()
+    ).limit(limit + 1)
+    if cursor:
+        created_at, session_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(db_models.ChatSession.created_at, db_models.ChatSession.id) < tuple_(created_at, session_id)
+        )
+
     result = await db.execute(query)
     sessions = result.all()
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(sessions[-1].created_at, sessions[-1].id)
     
     return [{
         "id": session.id,
         "name": session.name,
         "created_at": session.created_at,
-        "message_count": session.message_count
+        "message_count": session.message_count,
+        "last_message_at": session.last_message_at
     } for session in sessions]
 
 @router.post("/sessions", response_model=dict)
 async def create_chat_session(
     session_data: dict,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(auth.get_current_user)
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
 ):
     """Creates a new chat session."""
     # Create a new session with optional name from request data
     name = session_data.get("name", "New Chat")
     
-    # Create the session
-    chat_session = db_models.ChatSession(
-        user_id=current_user.id,
-        name=name
+    # Create the session; RETURNING hands back the server defaults without a refresh query
+    result = await db.execute(
+        insert(db_models.ChatSession)
+        .values(user_id=current_user.id, name=name)
+        .returning(db_models.ChatSession.id, db_models.ChatSession.name, db_models.ChatSession.created_at)
     )
-    db.add(chat_session)
+    chat_session = result.one()
     await db.commit()
-    await db.refresh(chat_session)
     
     return {
         "id": chat_session.id,
         "name": chat_session.name,
         "created_at": chat_session.created_at,
-        "message_count": 0
+        "message_count": 0,
+        "last_message_at": None
     }
 
 @router.get("/sessions/{session_id}", response_model=dict) 
-async def get_chat_session(session_id: int, db: Session = Depends(get_db), current_user: db_models.User = Depends(auth.get_current_user)):
-    """Gets details of a specific chat session including messages."""
-    # Use selectinload to eagerly load the messages
-    query = select(db_models.ChatSession).where(
+async def get_chat_session(
+    session_id: int,
+    limit: int = Query(settings.CHAT_MESSAGES_PAGE_SIZE, ge=1, le=settings.CHAT_PAGE_SIZE_MAX),
+    before: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
+):
+    """Gets a chat session with its latest messages (oldest first).
+
+    To scroll back, pass the returned next_cursor as `before`; has_more tells whether older messages exist.
+    """
+    query = select(
+        db_models.ChatSession.id,
+        db_models.ChatSession.name,
+        db_models.ChatSession.created_at,
+        db_models.ChatSession.message_count,
+        db_models.ChatSession.last_message_at
+    ).where(
         db_models.ChatSession.id == session_id,
         db_models.ChatSession.user_id == current_user.id
     )
     result = await db.execute(query)
-    session = result.scalar_one_or_none()
+    session = result.one_or_none()
 
     if not session:
         raise HTTPException(status_code=404, detail="Chat session not found")
 
-    # Explicitly load messages to avoid lazy loading issues
-    messages_query = select(db_models.ChatMessage).where(
+    # Newest page first from the (session_id, created_at, id) index, then flipped into reading order
+    messages_query = select(
+        db_models.ChatMessage.id,
+        db_models.ChatMessage.content,
+        db_models.ChatMessage.is_user_message,
+        db_models.ChatMessage.created_at,
+        db_models.ChatMessage.search_data
+    ).where(
         db_models.ChatMessage.session_id == session_id
-    ).order_by(db_models.ChatMessage.created_at)
+    ).order_by(
+        db_models.ChatMessage.created_at.desc(), db_models.ChatMessage.id.desc()
+    ).limit(limit + 1)
+    if before:
+        created_at, message_id = decode_cursor(before)
+        messages_query = messages_query.where(
+            tuple_(db_models.ChatMessage.created_at, db_models.ChatMessage.id) < tuple_(created_at, message_id)
+        )
     messages_result = await db.execute(messages_query)
-    messages = messages_result.scalars().all()
+    messages = messages_result.all()
+    has_more = len(messages) > limit
+    messages = list(reversed(messages[:limit]))
 
     return {
         "id": session.id,
         "name": session.name,
         "created_at": session.created_at,
+        "message_count": session.message_count,
+        "last_message_at": session.last_message_at,
         "messages": [{
             "id": msg.id,
             "content": msg.content,
             "is_user_message": msg.is_user_message,
             "created_at": msg.created_at,
             "searchData": msg.search_data 
-        } for msg in messages]
+        } for msg in messages],
+        "has_more": has_more,
+        "next_cursor": encode_cursor(messages[0].created_at, messages[0].id) if has_more else None
     }
 
 @router.put("/sessions/{session_id}", response_model=dict) 
@@ -155,53 +204,56 @@ async def update_chat_session(
     session_id: int,
     session_data: dict,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(auth.get_current_user)
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
 ):
     """Updates chat session properties (e.g., name)."""
-    query = select(db_models.ChatSession).where(
-        db_models.ChatSession.id == session_id,
-        db_models.ChatSession.user_id == current_user.id
-    )
-    result = await db.execute(query)
-    session = result.scalar_one_or_none() # Get single scalar result or None
+    columns = (db_models.ChatSession.id, db_models.ChatSession.name, db_models.ChatSession.created_at)
+    owned = (db_models.ChatSession.id == session_id, db_models.ChatSession.user_id == current_user.id)
+    if "name" in session_data:
+        # One round trip: UPDATE ... RETURNING both applies the change and checks ownership
+        statement = update(db_models.ChatSession).where(*owned).values(name=session_data["name"]).returning(*columns)
+    else:
+        statement = select(*columns).where(*owned)
+    result = await db.execute(statement)
+    session = result.one_or_none()
 
     if not session:
         raise HTTPException(status_code=404, detail="Chat session not found")
 
-    if "name" in session_data:
-        session.name = session_data["name"]
-
     await db.commit() # Async commit
 
     return {"id": session.id, "name": session.name, "created_at": session.created_at}
 
 @router.delete("/sessions/{session_id}", response_model=dict)
-async def delete_chat_session(session_id: int, db: Session = Depends(get_db), current_user: db_models.User = Depends(auth.get_current_user)):
+async def delete_chat_session(session_id: int, db: Session = Depends(get_db), current_user: AuthenticatedUser = Depends(auth.get_current_user)):
     """Deletes a chat session and all its messages."""
-    query = select(db_models.ChatSession).where(
+    # Statements only: an ORM delete would load the session's messages to process the relationship
+    owned_session = select(db_models.ChatSession.id).where(
         db_models.ChatSession.id == session_id,
         db_models.ChatSession.user_id == current_user.id
-    )
-    result = await db.execute(query)
-    session = result.scalar_one_or_none() # Get single scalar result or None
-
-    if not session:
-        raise HTTPException(status_code=404, detail="Chat session not found")
+    ).scalar_subquery()
 
     # Delete all messages in the session - Async delete
-    delete_messages = delete(db_models.ChatMessage).where(
-        db_models.ChatMessage.session_id == session_id
+    await db.execute(
+        delete(db_models.ChatMessage).where(db_models.ChatMessage.session_id == owned_session)
     )
-    await db.execute(delete_messages)
 
     # Delete session-PDF associations if you added those - Async delete
-    delete_pdf_assoc = delete(db_models.ChatSessionPDF).where(
-        db_models.ChatSessionPDF.chat_session_id == session_id
+    await db.execute(
+        delete(db_models.ChatSessionPDF).where(db_models.ChatSessionPDF.chat_session_id == owned_session)
     )
-    await db.execute(delete_pdf_assoc)
 
     # Delete the session itself
-    await db.delete(session)
+    result = await db.execute(
+        delete(db_models.ChatSession)
+        .where(db_models.ChatSession.id == session_id, db_models.ChatSession.user_id == current_user.id)
+        .returning(db_models.ChatSession.id)
+    )
+    if result.scalar_one_or_none() is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Chat session not found")
+
     await db.commit() # Async commit
+    history_service.forget_session(session_id)
 
-    return {"message": "Chat session and all associated messages deleted successfully"}
\ No newline at end of file
+    return {"message": "Chat session and all associated messages deleted successfully"}
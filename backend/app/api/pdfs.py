@@ -1,23 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.services import pdf_service
+from app.services import pdf_service, ingest_service
 from app.models import db_models
 from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
 from app.api import auth
+from app.services.auth_service import AuthenticatedUser
 import logging
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
-@router.post("/upload", response_model=dict)
+@router.post("/upload", response_model=dict, status_code=202)
 async def upload_pdf_for_user(
     file: UploadFile = File(...), 
     db: Session = Depends(get_db), 
-    current_user: db_models.User = Depends(auth.get_current_user)
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
 ):
-    """Uploads a PDF and associates it with the logged-in user."""
+    """Uploads a PDF for the logged-in user and queues it for background indexing."""
     # File validation
     if not file.filename:
         raise HTTPException(status_code=400, detail="No filename provided")
@@ -26,15 +28,7 @@ async def upload_pdf_for_user(
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
     try:
-        # Read the file once to check size
-        content = await file.read()
-        if len(content) > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="File too large (max 10MB)")
-        
-        # Reset file pointer
-        await file.seek(0)
-        
-        # Process the PDF
+        # Size and format are enforced while the upload is streamed to disk
         return await pdf_service.process_pdf_and_store(file, current_user.id, db)
     except HTTPException:
         raise
@@ -42,12 +36,21 @@ async def upload_pdf_for_user(
         logger.error(f"Error in upload_pdf_for_user: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to upload PDF: {str(e)}")
 
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_pdf_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
+):
+    """Returns status and progress (pages processed, chunks embedded) of a PDF ingestion job."""
+    return await ingest_service.get_job_status(job_id, current_user.id, db)
+
 # Add endpoints for listing PDFs, deleting PDFs, adding/removing from chats, etc.
 # Example:
 @router.get("/list", response_model=list[dict])
 async def list_user_pdfs(
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(auth.get_current_user)
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
 ):
     """List user PDFs endpoint - now calling the handler."""
     return await pdf_service.list_user_pdfs_handler(current_user, db) 
@@ -57,12 +60,12 @@ async def add_pdf_to_session(
     session_id: int,
     pdf_id: int,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(auth.get_current_user)
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
 ):
     """Adds a PDF to a chat session context."""
     # Verify the session belongs to the user
     session_result = await db.execute( # Async DB query
-        select(db_models.ChatSession)
+        select(db_models.ChatSession.id)
         .filter(db_models.ChatSession.id == session_id, db_models.ChatSession.user_id == current_user.id)
     )
     session = session_result.scalar_one_or_none() # Get single scalar result or None
@@ -72,7 +75,7 @@ async def add_pdf_to_session(
 
     # Verify the PDF belongs to the user
     pdf_result = await db.execute( # Async DB query
-        select(db_models.PDFDocument)
+        select(db_models.PDFDocument.id)
         .filter(db_models.PDFDocument.id == pdf_id, db_models.PDFDocument.user_id == current_user.id)
     )
     pdf = pdf_result.scalar_one_or_none() # Get single scalar result or None
@@ -80,21 +83,20 @@ async def add_pdf_to_session(
     if not pdf:
         raise HTTPException(status_code=404, detail="PDF document not found")
 
-    # Check if association already exists
-    existing_result = await db.execute( # Async DB query
-        select(db_models.ChatSessionPDF)
-        .filter(db_models.ChatSessionPDF.chat_session_id == session_id, db_models.ChatSessionPDF.pdf_document_id == pdf_id)
+    # The unique (session, PDF) constraint makes the insert a no-op for PDFs already in the session,
+    # without a separate existence check that concurrent requests could both pass
+    result = await db.execute(
+        insert(db_models.ChatSessionPDF)
+        .values(chat_session_id=session_id, pdf_document_id=pdf_id)
+        .on_conflict_do_nothing(constraint="uq_chat_session_pdfs_session_pdf")
+        .returning(db_models.ChatSessionPDF.id)
     )
-    existing = existing_result.scalar_one_or_none() # Get single scalar result or None
+    added = result.scalar_one_or_none()
+    await db.commit() # Async commit
 
-    if existing:
+    if added is None:
         return {"message": "PDF already added to this session"}
 
-    # Create the association
-    session_pdf = db_models.ChatSessionPDF(chat_session_id=session_id, pdf_document_id=pdf_id)
-    db.add(session_pdf)
-    await db.commit() # Async commit
-
     return {"message": "PDF added to chat session successfully"}
 
 @router.delete("/sessions/{session_id}/remove_pdf/{pdf_id}", response_model=dict)
@@ -102,12 +104,12 @@ async def remove_pdf_from_session(
     session_id: int,
     pdf_id: int,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(auth.get_current_user)
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
 ):
     """Removes a PDF from a chat session context."""
     # Verify the session belongs to the user
     session_result = await db.execute(
-        select(db_models.ChatSession)
+        select(db_models.ChatSession.id)
         .filter(db_models.ChatSession.id == session_id, db_models.ChatSession.user_id == current_user.id)
     )
     session = session_result.scalar_one_or_none()
@@ -116,22 +118,18 @@ async def remove_pdf_from_session(
         raise HTTPException(status_code=404, detail="Chat session not found")
 
     try:
-        # First find the association
-        assoc_result = await db.execute(
-            select(db_models.ChatSessionPDF)
-            .filter(
+        result = await db.execute(
+            delete(db_models.ChatSessionPDF)
+            .where(
                 db_models.ChatSessionPDF.chat_session_id == session_id,
                 db_models.ChatSessionPDF.pdf_document_id == pdf_id
             )
+            .returning(db_models.ChatSessionPDF.id)
         )
-        assoc = assoc_result.scalar_one_or_none()
         
         # Check if association exists
-        if not assoc:
+        if result.scalar_one_or_none() is None:
             raise HTTPException(status_code=404, detail="PDF not associated with this session")
-        
-        # Delete the association by object rather than using a delete statement
-        await db.delete(assoc)
         await db.commit()
         
         return {"message": "PDF removed from chat session successfully"}
@@ -148,12 +146,12 @@ async def remove_pdf_from_session(
 async def list_session_pdfs(
     session_id: int,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(auth.get_current_user)
+    current_user: AuthenticatedUser = Depends(auth.get_current_user)
 ):
     """Lists all PDFs associated with a chat session."""
     # Verify the session belongs to the user
     session_result = await db.execute( # Async DB query
-        select(db_models.ChatSession)
+        select(db_models.ChatSession.id)
         .filter(db_models.ChatSession.id == session_id, db_models.ChatSession.user_id == current_user.id)
     )
     session = session_result.scalar_one_or_none() # Get single scalar result or None
@@ -162,15 +160,16 @@ async def list_session_pdfs(
 
     # Get all PDFs associated with the session - Async query with join
     pdfs_result = await db.execute(
-        select(db_models.PDFDocument).
+        pdf_service.pdf_documents_with_source().
         join(db_models.ChatSessionPDF,
              db_models.ChatSessionPDF.pdf_document_id == db_models.PDFDocument.id).
         filter(db_models.ChatSessionPDF.chat_session_id == session_id)
     )
-    pdfs = pdfs_result.scalars().all() # Get scalar results
+    pdfs = pdfs_result.all()
 
     return [{
         "id": pdf.id,
         "filename": pdf.filename,
-        "upload_date": pdf.upload_date
+        "upload_date": pdf.upload_date,
+        "status": pdf.status
     } for pdf in pdfs]
\ No newline at end of file
@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+class TTLCache:
+    """In-process LRU cache with per-entry TTL, optional byte budget and hit/miss counters.
+
+    Not thread-safe; intended for use from the event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached value or None, refreshing its LRU position on a hit."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Stores a value, evicting least recently used entries to respect the size limits."""
+        if key in self._entries:
+            self._remove(key)
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        """Removes a key and returns its value (or None)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._remove(key)
+        return entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
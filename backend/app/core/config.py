@@ -22,12 +22,154 @@ class Settings:
     GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
     GOOGLE_VERTEX_API_KEY = os.environ.get("GOOGLE_VERTEX_API_KEY")
 
+    # Gemini (GEMINI_API_ENDPOINT points the REST transport at another host, e.g. a local fake server)
+    GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+    GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+    GEMINI_STREAM_QUEUE_SIZE = int(os.getenv("GEMINI_STREAM_QUEUE_SIZE", "32"))
+
     CLERK_ISSUER: str = os.getenv("CLERK_ISSUER")
     CLERK_JWT_AUDIENCE: str = os.getenv("CLERK_JWT_AUDIENCE", "http://localhost:5173") 
     CLERK_SECRET_KEY = os.environ.get("CLERK_SECRET_KEY")
     CLERK_JWKS_ENDPOINT = os.environ.get("CLERK_JWKS_ENDPOINT")
+    JWKS_CACHE_TTL_SECONDS = float(os.getenv("JWKS_CACHE_TTL_SECONDS", "3600"))
+    JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "30"))  # Floor between refreshes triggered by unknown key IDs
+    VERIFIED_TOKEN_CACHE_SECONDS = float(os.getenv("VERIFIED_TOKEN_CACHE_SECONDS", "60"))  # Never longer than the token's own exp
+    VERIFIED_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("VERIFIED_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "600"))
+
+    # Anonymous message quota (sliding window per anonymous cookie). The "memory" backend is
+    # per-process; use "sqlite" with a path on shared storage when running several workers.
+    ANONYMOUS_MESSAGE_LIMIT = int(os.getenv("ANONYMOUS_MESSAGE_LIMIT", "3"))
+    ANONYMOUS_QUOTA_WINDOW_SECONDS = float(os.getenv("ANONYMOUS_QUOTA_WINDOW_SECONDS", str(7 * 24 * 3600)))
+    QUOTA_BACKEND = os.getenv("QUOTA_BACKEND", "memory")
+    QUOTA_MAX_KEYS = int(os.getenv("QUOTA_MAX_KEYS", "100000"))  # Memory backend evicts least recently seen keys beyond this
+    QUOTA_SQLITE_PATH = os.getenv("QUOTA_SQLITE_PATH", "data/quota.sqlite3")
     
     TAVILY_API_KEY = os.environ.get("TAVILLY_API_KEY")
+    TAVILY_API_URL = os.getenv("TAVILY_API_URL", "https://api.tavily.com/search")
+    TAVILY_TIMEOUT_SECONDS = float(os.getenv("TAVILY_TIMEOUT_SECONDS", "10"))
+    TAVILY_MAX_RESULTS = int(os.getenv("TAVILY_MAX_RESULTS", "5"))
+    TAVILY_RESULT_MAX_CHARS = int(os.getenv("TAVILY_RESULT_MAX_CHARS", "600"))  # Per-result content budget for prompt, SSE and storage
+    TAVILY_CACHE_MAX_ENTRIES = int(os.getenv("TAVILY_CACHE_MAX_ENTRIES", "1000"))
+    TAVILY_CACHE_TTL_SECONDS = float(os.getenv("TAVILY_CACHE_TTL_SECONDS", "900"))
+
+    # PDF chunking and embedding
+    PDF_CHUNK_TOKENS = int(os.getenv("PDF_CHUNK_TOKENS", "350"))
+    PDF_CHUNK_OVERLAP_TOKENS = int(os.getenv("PDF_CHUNK_OVERLAP_TOKENS", "50"))
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+    # Embedding client (point JINAAI_API_URL at a local fake server for testing)
+    JINAAI_API_URL = os.getenv("JINAAI_API_URL", "https://api.jina.ai/v1/embeddings")
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "jina-embeddings-v2-base-en")
+    EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "15"))
+    EMBEDDING_MAX_CONNECTIONS = int(os.getenv("EMBEDDING_MAX_CONNECTIONS", "10"))
+    # Document batches in flight at once; kept below the connection limit so query embeddings still get a connection
+    EMBEDDING_MAX_CONCURRENT_BATCHES = int(os.getenv("EMBEDDING_MAX_CONCURRENT_BATCHES", str(max(EMBEDDING_MAX_CONNECTIONS - 2, 1))))
+    EMBEDDING_MICROBATCH_WINDOW_MS = float(os.getenv("EMBEDDING_MICROBATCH_WINDOW_MS", "5"))  # 0 disables micro-batching
+
+    # Query embedding cache (EMBEDDING_CACHE_PATH enables the persistent SQLite tier)
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+    EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+    EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "100000"))  # SQLite tier; oldest rows go first (~3 KB each)
+
+    # PDF uploads are streamed to disk in PDF_UPLOAD_READ_BYTES pieces, never held whole in memory
+    PDF_MAX_UPLOAD_BYTES = int(os.getenv("PDF_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+    PDF_UPLOAD_READ_BYTES = int(os.getenv("PDF_UPLOAD_READ_BYTES", str(64 * 1024)))
+
+    # Re-uploads of identical bytes reuse existing chunks; set PDF_DEDUP_GLOBAL to share across users
+    PDF_DEDUP_GLOBAL = os.getenv("PDF_DEDUP_GLOBAL", "false").lower() == "true"
+
+    # Background PDF ingestion (uploaded files are kept in PDF_JOB_DIR until their job completes)
+    PDF_INGEST_WORKERS = int(os.getenv("PDF_INGEST_WORKERS", "2"))
+    PDF_JOB_DIR = os.getenv("PDF_JOB_DIR", "data/pdf_jobs")
+    PDF_JOB_STALE_SECONDS = int(os.getenv("PDF_JOB_STALE_SECONDS", "300"))  # Running jobs without progress for this long are reclaimed
+
+    # PDF text extraction runs in a process pool; each document gets a total CPU time budget
+    PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+    PDF_EXTRACT_CPU_SECONDS = float(os.getenv("PDF_EXTRACT_CPU_SECONDS", "120"))
+    PDF_EXTRACT_PARALLEL_THRESHOLD = int(os.getenv("PDF_EXTRACT_PARALLEL_THRESHOLD", "40"))  # Pages above which ranges are parsed in parallel
+    PDF_EXTRACT_PAGES_PER_TASK = int(os.getenv("PDF_EXTRACT_PAGES_PER_TASK", "20"))
+
+    # Vector search (HNSW candidate list size; widened iteratively when filters are selective)
+    VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "40"))
+    VECTOR_EF_SEARCH_MAX = int(os.getenv("VECTOR_EF_SEARCH_MAX", "1000"))
+
+    # Hybrid retrieval: full-text and vector rankings merged with weighted reciprocal-rank fusion
+    HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+    HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))  # 0 disables the full-text leg
+    HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+    HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "4"))  # Candidates per leg = top_n * this
+    HYBRID_MAX_LEXICAL_TERMS = int(os.getenv("HYBRID_MAX_LEXICAL_TERMS", "32"))
+
+    # Maximal marginal relevance re-ranking of document chunks (1.0 = relevance only, stage skipped)
+    MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+    MMR_CANDIDATES = int(os.getenv("MMR_CANDIDATES", "25"))
+
+
+    # Per-source deadlines for the context gathered before a chat answer starts streaming
+    RETRIEVAL_HISTORY_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_HISTORY_TIMEOUT_SECONDS", "2"))
+    RETRIEVAL_DOCUMENTS_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_DOCUMENTS_TIMEOUT_SECONDS", "4"))
+    RETRIEVAL_WEB_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_WEB_TIMEOUT_SECONDS", "6"))
+
+
+    # Prompt assembly: token budget shared by history, document and web context (by weight).
+    # The last PROMPT_RECENT_MESSAGES messages stay verbatim; older ones are folded into a
+    # rolling summary stored on the chat session.
+    PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "6000"))
+    PROMPT_HISTORY_WEIGHT = int(os.getenv("PROMPT_HISTORY_WEIGHT", "2"))
+    PROMPT_DOCUMENTS_WEIGHT = int(os.getenv("PROMPT_DOCUMENTS_WEIGHT", "4"))
+    PROMPT_WEB_WEIGHT = int(os.getenv("PROMPT_WEB_WEIGHT", "3"))
+    PROMPT_RECENT_MESSAGES = int(os.getenv("PROMPT_RECENT_MESSAGES", "6"))
+    PROMPT_SUMMARY_MAX_TOKENS = int(os.getenv("PROMPT_SUMMARY_MAX_TOKENS", "400"))
+    PROMPT_SUMMARY_SHARE = float(os.getenv("PROMPT_SUMMARY_SHARE", "0.25"))  # Of the history budget; more only if recent turns leave room
+    PROMPT_SUMMARY_LINE_TOKENS = int(os.getenv("PROMPT_SUMMARY_LINE_TOKENS", "40"))
+    PROMPT_SUMMARY_MAX_BACKFILL = int(os.getenv("PROMPT_SUMMARY_MAX_BACKFILL", "200"))  # Older unsummarized messages are skipped
+
+    # In-memory history buffers of active chat sessions (idle sessions expire, least recently used are evicted)
+    HISTORY_CACHE_MAX_SESSIONS = int(os.getenv("HISTORY_CACHE_MAX_SESSIONS", "5000"))
+    HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    HISTORY_CACHE_IDLE_SECONDS = float(os.getenv("HISTORY_CACHE_IDLE_SECONDS", "900"))
+
+    # Exact-match answer cache (normalized question + context fingerprint); ANSWER_CACHE_MODES
+    # lists the modes that use it: "chat" (no web search) and/or "search"
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_MODES = {mode.strip() for mode in os.getenv("ANSWER_CACHE_MODES", "chat,search").split(",") if mode.strip()}
+    ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "1800"))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+    ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    ANSWER_CACHE_REPLAY_CHARS = int(os.getenv("ANSWER_CACHE_REPLAY_CHARS", "200"))  # Size of replayed content frames
+
+
+    # Keyset pagination of chat sessions and messages
+    CHAT_SESSIONS_PAGE_SIZE = int(os.getenv("CHAT_SESSIONS_PAGE_SIZE", "50"))
+    CHAT_MESSAGES_PAGE_SIZE = int(os.getenv("CHAT_MESSAGES_PAGE_SIZE", "50"))
+    CHAT_PAGE_SIZE_MAX = int(os.getenv("CHAT_PAGE_SIZE_MAX", "200"))
+
+    # Startup: migrations normally run as a deploy step (python -m app.migrations), not on every boot
+    MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true"
+    DB_WARMUP_CONNECTIONS = int(os.getenv("DB_WARMUP_CONNECTIONS", "2"))  # Per engine, opened before reporting ready
+    DB_WARMUP_RETRY_SECONDS = float(os.getenv("DB_WARMUP_RETRY_SECONDS", "5"))
+
+    # Connection pools, per engine (DB_* for the primary database, NEON_DB_* for Neon)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))  # Wait for a free connection before failing
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "300"))  # Replace connections older than this
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # asyncpg prepared statements; 0 behind PgBouncer transaction pooling
+    NEON_DB_POOL_SIZE = int(os.getenv("NEON_DB_POOL_SIZE", "5"))
+    NEON_DB_MAX_OVERFLOW = int(os.getenv("NEON_DB_MAX_OVERFLOW", "10"))
+    NEON_DB_POOL_TIMEOUT_SECONDS = float(os.getenv("NEON_DB_POOL_TIMEOUT_SECONDS", "30"))
+    NEON_DB_POOL_RECYCLE_SECONDS = int(os.getenv("NEON_DB_POOL_RECYCLE_SECONDS", "300"))
+    NEON_DB_POOL_PRE_PING = os.getenv("NEON_DB_POOL_PRE_PING", "true").lower() == "true"
+    NEON_DB_STATEMENT_CACHE_SIZE = int(os.getenv("NEON_DB_STATEMENT_CACHE_SIZE", "100"))
+
+    # /metrics/* require "Authorization: Bearer <METRICS_TOKEN>"; unset, they are not served at all
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
 
 settings = Settings()
\ No newline at end of file
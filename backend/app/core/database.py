@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
 from .config import settings
+from .pool_metrics import InstrumentedAsyncQueuePool
+import asyncio
 import ssl
 import logging
 
@@ -20,24 +22,96 @@ ssl_context = ssl.create_default_context()
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
 
-# Pass SSL configuration as connect_args
-engine = create_async_engine(
+def create_pooled_engine(
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: float,
+    pool_recycle: int,
+    pre_ping: bool,
+    statement_cache_size: int
+):
+    """Async engine over an instrumented pool (see pool_metrics), with SSL and asyncpg's statement cache size."""
+    return create_async_engine(
+        url,
+        connect_args={"ssl": ssl_context, "statement_cache_size": statement_cache_size},
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pre_ping
+    )
+
+engine = create_pooled_engine(
     DATABASE_URL,
-    connect_args={"ssl": ssl_context}
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pre_ping=settings.DB_POOL_PRE_PING,
+    statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE
 )
 
-# Fix: Add SSL for NeonDB connection as well
-neon_engine = create_async_engine(
+neon_engine = create_pooled_engine(
     NEON_DATABASE_URL,
-    connect_args={"ssl": ssl_context},
-    # Add connection pooling settings
-    pool_pre_ping=True,        # Verify connections before using them
-    pool_recycle=300,          # Recycle connections after 5 minutes
-    pool_size=5,               # Keep a smaller pool size
-    max_overflow=10,           # Allow up to 10 extra connections
-    pool_timeout=30            # Wait up to 30 seconds for a connection
+    pool_size=settings.NEON_DB_POOL_SIZE,
+    max_overflow=settings.NEON_DB_MAX_OVERFLOW,
+    pool_timeout=settings.NEON_DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.NEON_DB_POOL_RECYCLE_SECONDS,
+    pre_ping=settings.NEON_DB_POOL_PRE_PING,
+    statement_cache_size=settings.NEON_DB_STATEMENT_CACHE_SIZE
 )
 
+def pool_stats() -> dict:
+    """Checkout, overflow and acquire-wait statistics for both engines' pools."""
+    return {"primary": engine.pool.stats(), "neon": neon_engine.pool.stats()}
+
+async def register_vector_codec(conn):
+    """Registers a binary codec for pgvector's vector type on a raw asyncpg connection.
+
+    Query vectors can then be sent as bound parameters (3 KB of float32 for 768 dims)
+    instead of being formatted into the SQL text, so asyncpg can reuse prepared statements.
+    """
+    from pgvector import Vector
+
+    def encode(value):
+        # The ORM's Vector column type binds the text form '[1.0,2.0,...]'
+        if isinstance(value, str):
+            value = [float(v) for v in value[1:-1].split(',')]
+        if not isinstance(value, Vector):
+            value = Vector(value)
+        return value.to_binary()
+
+    try:
+        await conn.set_type_codec(
+            'vector',
+            schema='public',
+            encoder=encode,
+            decoder=Vector.from_binary,
+            format='binary'
+        )
+    except ValueError as e:
+        # The pgvector extension has not been created in this database yet
+        logger.warning(f"Could not register vector codec: {e}")
+
+@event.listens_for(neon_engine.sync_engine, "connect")
+def _on_neon_connect(dbapi_connection, connection_record):
+    dbapi_connection.run_async(register_vector_codec)
+
+async def warm_up_pool(engine, connections: int):
+    """Opens pooled connections up front, so early requests skip TCP, TLS and authentication setup."""
+    opened = await asyncio.gather(*(engine.connect().start() for _ in range(connections)), return_exceptions=True)
+    conns = [conn for conn in opened if not isinstance(conn, BaseException)]
+    try:
+        for conn in opened:
+            if isinstance(conn, BaseException):
+                raise conn
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    finally:
+        # Closing returns the connections to the pool, where they stay open
+        await asyncio.gather(*(conn.close() for conn in conns), return_exceptions=True)
+
 AsyncSessionLocal = sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
 )
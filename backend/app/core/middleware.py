@@ -0,0 +1,41 @@
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized request bodies on upload routes while they are still being received.
+
+    A declared Content-Length over the limit is refused before any body is read; otherwise
+    received bytes are counted and the request is aborted as soon as the limit is crossed,
+    instead of letting the multipart parser spool the whole body first.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_bytes: int, path_prefixes: tuple[str, ...]):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"File too large (max {self.max_body_bytes // (1024 * 1024)}MB)"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,18 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque keyset cursor for a (created_at, id) position."""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Parses a cursor produced by encode_cursor; malformed cursors are a client error."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
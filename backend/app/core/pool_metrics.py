@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import deque
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+class PoolMetrics:
+    """Acquire-wait and usage counters for one connection pool."""
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)  # Recent acquire waits (seconds), for percentiles
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def record(self, wait: float, timed_out: bool, checked_out: int, overflow: int):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.acquired += 1
+            self._waits.append(wait)
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def stats(self, pool) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            attempts = self.acquired + self.timeouts
+
+            def percentile(p: float) -> float:
+                return round(waits[min(int(len(waits) * p), len(waits) - 1)] * 1000, 2) if waits else 0.0
+
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": pool.max_overflow,
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "wait_ms_mean": round(self.wait_seconds_total / attempts * 1000, 2) if attempts else 0.0,
+                "wait_ms_p50": percentile(0.5),
+                "wait_ms_p95": percentile(0.95),
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 2),
+            }
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waits for a connection.
+
+    The wait covers queueing for a free connection, opening a new one (including overflow
+    connections) and the pre-ping, i.e. everything between asking and getting a usable connection.
+    """
+
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow  # As configured; QueuePool keeps its copy private
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - started, True, self.checkedout(), max(self.overflow(), 0))
+            raise
+        self.metrics.record(time.perf_counter() - started, False, self.checkedout(), max(self.overflow(), 0))
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep the counters across it
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def stats(self) -> dict:
+        return self.metrics.stats(self)
@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+class QueryCounter:
+    """Records the SQL statements an engine executes while the counter is active."""
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries(engine):
+    """Counts statements executed on engine (sync or async) inside the block.
+
+        with count_queries(engine) as counter:
+            await client.get("/chat/sessions")
+        assert counter.count == 1, counter.statements
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    counter = QueryCounter()
+    event.listen(sync_engine, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", counter._record)
@@ -1,45 +1,97 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
+import hmac
 
-from sqlalchemy import text
 from app.api import chat, pdfs, auth  # Import API routers
-from app.core.database import engine, Base, neon_engine, NeonBase 
+from app.core.config import settings
+from app.core.middleware import UploadSizeLimitMiddleware
+from app.core.database import engine, neon_engine, pool_stats, warm_up_pool
+from app.services import embedding_service, ingest_service, extraction_service, auth_service, quota_service, tavily_service, history_service, answer_cache
 import logging 
 
 logging.basicConfig(level=logging.INFO) 
 logger = logging.getLogger(__name__) 
 
-async def lifespan(app: FastAPI):
-    # Create Supabase tables (common tables) if they don't exist
-    async with engine.begin() as conn:
-
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("Supabase tables verified/created")
+# Set once each database's pool is warm; /health/ready reports these
+_ready = {"primary": False, "neon": False}
+_warm_up_tasks: list[asyncio.Task] = []
 
-    # Create NeonDB tables (vector‑specific models) if they don't exist
-    async with neon_engine.begin() as neon_conn:
+async def _warm_up(name: str, db_engine, on_ready=None):
+    """Warms a database pool in the background, retrying until the database answers."""
+    while True:
         try:
-            await neon_conn.run_sync(NeonBase.metadata.create_all)
-            logger.info("Neon tables verified/created")
-            
+            await warm_up_pool(db_engine, settings.DB_WARMUP_CONNECTIONS)
+            if on_ready:
+                await on_ready()
+            break
         except Exception as e:
-            logger.error(f"Error setting up Neon database: {str(e)}")
-    logger.info("Neon tables verified/created")
+            logger.warning(f"{name} database not ready, retrying in {settings.DB_WARMUP_RETRY_SECONDS}s: {str(e)}")
+            await asyncio.sleep(settings.DB_WARMUP_RETRY_SECONDS)
+    _ready[name] = True
+    logger.info(f"{name} database pool warmed up")
+
+async def _migrate():
+    """Applies pending migrations at boot; only when MIGRATE_ON_STARTUP is set (e.g. local development)."""
+    from app.migrations import run_migrations
+    from app.migrations.primary import PRIMARY_MIGRATIONS
+    from app.migrations.neon import NEON_MIGRATIONS
+
+    # Bring the Supabase schema (common tables) up to date
+    await run_migrations(engine, PRIMARY_MIGRATIONS, "primary")
+    logger.info("Supabase tables verified/created")
+
+    # Bring the NeonDB schema (vector‑specific models) up to date
+    try:
+        await run_migrations(neon_engine, NEON_MIGRATIONS, "neon")
+        logger.info("Neon tables verified/created")
+    except Exception as e:
+        logger.error(f"Error setting up Neon database: {str(e)}")
+
+async def lifespan(app: FastAPI):
+    # Schema changes are a deploy step (python -m app.migrations) rather than part of every boot
+    if settings.MIGRATE_ON_STARTUP:
+        await _migrate()
+
+    await ingest_service.start_ingest_workers()
+    # The app starts serving (and answers liveness) right away; readiness waits for the pools
+    _warm_up_tasks.append(asyncio.create_task(_warm_up("primary", engine, ingest_service.requeue_pending_jobs)))
+    _warm_up_tasks.append(asyncio.create_task(_warm_up("neon", neon_engine)))
     
     yield  # This is where the app runs
     
     # Shutdown: Add any cleanup code here
+    for task in _warm_up_tasks:
+        task.cancel()
+    await asyncio.gather(*_warm_up_tasks, return_exceptions=True)
+    _warm_up_tasks.clear()
+    await ingest_service.stop_ingest_workers()
+    extraction_service.shutdown_extraction_pool()
+    await embedding_service.close_embedding_client()
+    await auth_service.close_auth_client()
+    await tavily_service.close_tavily_client()
+    await quota_service.close_quota_backend()
     logger.info("Shutting down application")
 
 app = FastAPI(lifespan=lifespan)
 
+# Added before CORSMiddleware so CORS wraps it and its 413 carries the CORS headers.
+# Multipart framing adds a little on top of the file itself; the exact file size is checked while streaming
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_bytes=settings.PDF_MAX_UPLOAD_BYTES + 64 * 1024,
+    path_prefixes=("/pdf/upload",)
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://perplexia.netlify.app","https://perplexia-gb.netlify.app", "http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
@@ -47,9 +99,46 @@ app.include_router(pdfs.router, prefix="/pdf", tags=["Pdf"])
 app.include_router(auth.router, prefix="/auth", tags=["Auth"]) 
 
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
+    """Liveness: the process is up and serving requests."""
     return {"status": "ok"}
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: the primary database pool is warm. Neon is reported but not required, as at startup."""
+    ready = _ready["primary"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "databases": _ready}
+    )
+
+async def require_metrics_token(authorization: str = Header(None)):
+    """Guards the metrics endpoints: 404 unless METRICS_TOKEN is set, 401 without the matching bearer token."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+@app.get("/metrics/caches", dependencies=[Depends(require_metrics_token)])
+async def cache_metrics():
+    """Hit/miss counters and sizes of the in-process caches."""
+    from app.services.embedding_cache import get_embedding_cache
+
+    return {
+        "answers": answer_cache.answer_cache_stats(),
+        "history": history_service.history_cache_stats(),
+        "web_search": tavily_service.tavily_cache_stats(),
+        "embeddings": get_embedding_cache().stats(),
+        "auth": auth_service.auth_cache_stats(),
+    }
+
+@app.get("/metrics/pools", dependencies=[Depends(require_metrics_token)])
+async def pool_metrics():
+    """Database connection pool usage and time spent waiting to acquire a connection, per engine."""
+    return pool_stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1 @@
+from .runner import ConcurrentIndex, Migration, run_migrations, migrate_all
@@ -0,0 +1,22 @@
+"""Applies pending schema migrations to the primary and Neon databases.
+
+    python -m app.migrations
+
+Run from the backend directory, with the usual database environment variables set.
+"""
+import asyncio
+import logging
+
+from app.core.database import engine, neon_engine
+from app.migrations import migrate_all
+
+async def main():
+    try:
+        await migrate_all()
+    finally:
+        await engine.dispose()
+        await neon_engine.dispose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+from app.core.database import NeonBase
+from app.models import db_models  # noqa: F401 (registers the tables on the metadata)
+from sqlalchemy import text
+from app.migrations.runner import ConcurrentIndex, Migration
+
+async def _create_tables(conn):
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    await conn.run_sync(NeonBase.metadata.create_all)
+
+# Append-only: applied versions are recorded in schema_migrations, so released entries must not change
+NEON_MIGRATIONS = [
+    # Fresh databases get the full current schema here; later steps are no-ops for them
+    Migration("0001_baseline", (_create_tables,)),
+    # document_chunks tables created before the typed filter columns existed
+    Migration("0002_document_chunk_columns", (
+        "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS user_id INTEGER",
+        "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS pdf_document_id INTEGER",
+        # Older rows stored metadata as a JSON-encoded string inside JSONB, so unwrap it first
+        """
+        UPDATE document_chunks AS dc
+        SET user_id = (src.metadata ->> 'user_id')::int,
+            pdf_document_id = (src.metadata ->> 'pdf_document_id')::int
+        FROM (
+            SELECT id,
+                   CASE WHEN jsonb_typeof(document_metadata) = 'string'
+                        THEN (document_metadata #>> '{}')::jsonb
+                        ELSE document_metadata END AS metadata
+            FROM document_chunks
+            WHERE user_id IS NULL AND document_metadata IS NOT NULL
+        ) AS src
+        WHERE dc.id = src.id
+        """,
+        "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS chunk_index INTEGER",
+        """
+        UPDATE document_chunks
+        SET chunk_index = COALESCE(
+            (CASE WHEN jsonb_typeof(document_metadata) = 'string'
+                  THEN (document_metadata #>> '{}')::jsonb
+                  ELSE document_metadata END ->> 'chunk_index')::int,
+            0)
+        WHERE chunk_index IS NULL
+        """,
+        # Adding a stored generated column rewrites the table, so this one step does hold a lock
+        """
+        ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS chunk_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(chunk_text, ''))) STORED
+        """,
+    )),
+    Migration("0003_search_indexes", (
+        ConcurrentIndex(
+            "ix_document_chunks_user_pdf",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_user_pdf ON document_chunks (user_id, pdf_document_id)"
+        ),
+        ConcurrentIndex(
+            "ix_document_chunks_embedding_hnsw",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_embedding_hnsw "
+            "ON document_chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        ),
+        ConcurrentIndex(
+            "ix_document_chunks_chunk_tsv",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_chunk_tsv ON document_chunks USING gin (chunk_tsv)"
+        ),
+    ), transactional=False),
+]
@@ -0,0 +1,80 @@
+from app.core.database import Base
+from app.models import db_models  # noqa: F401 (registers the tables on the metadata)
+from app.migrations.runner import ConcurrentIndex, Migration
+
+async def _create_tables(conn):
+    await conn.run_sync(Base.metadata.create_all)
+
+# Append-only: applied versions are recorded in schema_migrations, so released entries must not change
+PRIMARY_MIGRATIONS = [
+    # Fresh databases get the full current schema here; later steps are no-ops for them
+    Migration("0001_baseline", (_create_tables,)),
+    # pdf_documents tables created before ingestion jobs existed
+    Migration("0002_pdf_ingest_columns", (
+        "ALTER TABLE pdf_documents ADD COLUMN IF NOT EXISTS status VARCHAR NOT NULL DEFAULT 'ready'",
+        "ALTER TABLE pdf_documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+        "ALTER TABLE pdf_documents ADD COLUMN IF NOT EXISTS source_pdf_document_id INTEGER REFERENCES pdf_documents (id)",
+    )),
+    # chat_sessions tables created before rolling history summaries and maintained counters existed
+    Migration("0003_chat_session_columns", (
+        "ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS history_summary TEXT",
+        "ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summarized_message_id INTEGER",
+        "ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE",
+        # Backfill sessions whose messages predate the maintained counters
+        """
+        UPDATE chat_sessions AS cs
+        SET message_count = m.message_count, last_message_at = m.last_message_at
+        FROM (
+            SELECT session_id, count(*) AS message_count, max(created_at) AS last_message_at
+            FROM chat_messages
+            GROUP BY session_id
+        ) AS m
+        WHERE cs.id = m.session_id AND cs.last_message_at IS NULL
+        """,
+    )),
+    # Indexes for the per-user and per-session read paths
+    Migration("0004_access_path_indexes", (
+        ConcurrentIndex(
+            "ix_pdf_documents_content_hash",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pdf_documents_content_hash ON pdf_documents (content_hash)"
+        ),
+        ConcurrentIndex(
+            "ix_pdf_documents_user",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pdf_documents_user ON pdf_documents (user_id, id)"
+        ),
+        ConcurrentIndex(
+            "ix_chat_sessions_user_created",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_sessions_user_created ON chat_sessions (user_id, created_at, id)"
+        ),
+        ConcurrentIndex(
+            "ix_chat_messages_session_created",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_messages_session_created ON chat_messages (session_id, created_at, id)"
+        ),
+    ), transactional=False),
+    # One row per (session, PDF). Duplicates left by the old check-then-insert are removed first, keeping
+    # the earliest; the unique index is built without blocking writes and then attached as the constraint.
+    Migration("0005_unique_session_pdf", (
+        """
+        DELETE FROM chat_session_pdfs AS dup
+        USING chat_session_pdfs AS keep
+        WHERE dup.chat_session_id = keep.chat_session_id
+          AND dup.pdf_document_id = keep.pdf_document_id
+          AND dup.id > keep.id
+        """,
+        ConcurrentIndex(
+            "uq_chat_session_pdfs_session_pdf",
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_chat_session_pdfs_session_pdf "
+            "ON chat_session_pdfs (chat_session_id, pdf_document_id)"
+        ),
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_chat_session_pdfs_session_pdf') THEN
+                ALTER TABLE chat_session_pdfs
+                ADD CONSTRAINT uq_chat_session_pdfs_session_pdf UNIQUE USING INDEX uq_chat_session_pdfs_session_pdf;
+            END IF;
+        END $$
+        """,
+    ), transactional=False),
+]
@@ -0,0 +1,106 @@
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Union
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Serializes migration runs across workers and deploys (pg_advisory_lock key)
+MIGRATION_LOCK_KEY = 727_465_001
+
+@dataclass(frozen=True)
+class ConcurrentIndex:
+    """CREATE [UNIQUE] INDEX CONCURRENTLY step; builds without blocking writes to the table.
+
+    A failed concurrent build leaves an INVALID index behind, so the runner drops an invalid
+    index of the same name before (re)trying.
+    """
+    name: str
+    sql: str
+
+Step = Union[str, ConcurrentIndex, Callable[[AsyncConnection], Awaitable[None]]]
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    steps: tuple[Step, ...]
+    # Transactional migrations apply all steps and record the version atomically. Concurrent
+    # index builds cannot run inside a transaction, so migrations containing them run each
+    # step in autocommit mode and must be safe to re-run from the start.
+    transactional: bool = True
+
+async def _applied_versions(conn: AsyncConnection) -> set[str]:
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR PRIMARY KEY,
+            applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+        )
+    """))
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return set(result.scalars().all())
+
+async def _run_step(conn: AsyncConnection, step: Step):
+    if isinstance(step, ConcurrentIndex):
+        invalid = await conn.execute(text("""
+            SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname = :name AND NOT i.indisvalid
+        """), {"name": step.name})
+        if invalid.first():
+            logger.warning(f"Dropping invalid index {step.name} left by an interrupted build")
+            await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{step.name}"'))
+        await conn.execute(text(step.sql))
+    elif isinstance(step, str):
+        await conn.execute(text(step))
+    else:
+        await step(conn)
+
+async def _record(conn: AsyncConnection, version: str):
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version) VALUES (:version) ON CONFLICT DO NOTHING"),
+        {"version": version}
+    )
+
+async def run_migrations(engine: AsyncEngine, migrations: list[Migration], label: str) -> list[str]:
+    """Applies the migrations not yet recorded in the database's schema_migrations table, in order."""
+    applied_now = []
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            applied = await _applied_versions(lock_conn)
+            for migration in migrations:
+                if migration.version in applied:
+                    continue
+                started = time.perf_counter()
+                if migration.transactional:
+                    async with engine.begin() as conn:
+                        for step in migration.steps:
+                            if isinstance(step, ConcurrentIndex):
+                                raise ValueError(f"{migration.version}: concurrent index builds need transactional=False")
+                            await _run_step(conn, step)
+                        await _record(conn, migration.version)
+                else:
+                    async with engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        for step in migration.steps:
+                            await _run_step(conn, step)
+                        await _record(conn, migration.version)
+                applied_now.append(migration.version)
+                logger.info(f"[{label}] Applied migration {migration.version} in {time.perf_counter() - started:.1f}s")
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+    if not applied_now:
+        logger.info(f"[{label}] Schema is up to date")
+    return applied_now
+
+async def migrate_all():
+    """Migrates the primary database, then the Neon vector database."""
+    from app.core.database import engine, neon_engine
+    from app.migrations.primary import PRIMARY_MIGRATIONS
+    from app.migrations.neon import NEON_MIGRATIONS
+
+    await run_migrations(engine, PRIMARY_MIGRATIONS, "primary")
+    await run_migrations(neon_engine, NEON_MIGRATIONS, "neon")
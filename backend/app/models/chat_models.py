@@ -1,11 +1,16 @@
 from typing import List, Optional
 from fastapi import UploadFile
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class ChatRequest(BaseModel):
     query: str
     isSearchMode: bool
     session_id: Optional[int] = None  # Changed from chat_session_id
+    # Optional per-request weights for hybrid document retrieval (defaults come from settings)
+    vector_weight: Optional[float] = Field(default=None, ge=0)
+    lexical_weight: Optional[float] = Field(default=None, ge=0)
+    # Relevance/diversity trade-off for re-ranking document chunks (1 disables re-ranking)
+    mmr_lambda: Optional[float] = Field(default=None, ge=0, le=1)
 
 class ChatResponse(BaseModel): # Adjust if needed, SSE streaming changes this
     answer: str
@@ -1,11 +1,14 @@
 from sqlalchemy import Column, Float, Integer, String, DateTime, ForeignKey, Boolean, Text, TypeDecorator
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects import postgresql
 from app.core.database import Base, NeonBase
 from pgvector.sqlalchemy import Vector
 import sqlalchemy as sa
 
+# Relationships default to lazy="raise_on_sql": reads project the columns they need or opt into
+# eager loading per query (selectinload/joinedload), so no query silently pulls in related rows.
+
 class User(Base):
     __tablename__ = "users"
 
@@ -15,24 +18,36 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    chat_sessions = relationship("ChatSession", back_populates="user")
-    pdf_documents = relationship("PDFDocument", back_populates="user")
+    chat_sessions = relationship("ChatSession", back_populates="user", lazy="raise_on_sql")
+    pdf_documents = relationship("PDFDocument", back_populates="user", lazy="raise_on_sql")
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        sa.Index("ix_chat_sessions_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     name = Column(String, default="New Chat") # Optional chat name
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-
-    user = relationship("User", back_populates="chat_sessions")
-    messages = relationship("ChatMessage", back_populates="chat_session", lazy="selectin")
-    pdf_documents_assoc = relationship("ChatSessionPDF", back_populates="chat_session")
-    pdf_documents = relationship("PDFDocument", secondary="chat_session_pdfs", backref="chat_sessions")
+    # Rolling summary of messages older than the verbatim prompt window, up to summarized_message_id
+    history_summary = Column(Text, nullable=True)
+    summarized_message_id = Column(Integer, nullable=True)
+    # Maintained when messages are saved, so session lists need no COUNT join
+    message_count = Column(Integer, nullable=False, server_default="0")
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+
+    user = relationship("User", back_populates="chat_sessions", lazy="raise_on_sql")
+    messages = relationship("ChatMessage", back_populates="chat_session", lazy="raise_on_sql")
+    pdf_documents_assoc = relationship("ChatSessionPDF", back_populates="chat_session", lazy="raise_on_sql")
+    pdf_documents = relationship("PDFDocument", secondary="chat_session_pdfs", backref=backref("chat_sessions", lazy="raise_on_sql"), lazy="raise_on_sql")
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        sa.Index("ix_chat_messages_session_created", "session_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"))
@@ -42,11 +57,14 @@ class ChatMessage(Base):
     is_user_message = Column(Boolean, default=True) # Flag if message is from user or bot
     search_data = Column(postgresql.JSONB(astext_type=Text), nullable=True)
 
-    chat_session = relationship("ChatSession", back_populates="messages", lazy="selectin")
-    user = relationship("User") # Optional user relationship
+    chat_session = relationship("ChatSession", back_populates="messages", lazy="raise_on_sql")
+    user = relationship("User", lazy="raise_on_sql") # Optional user relationship
 
 class PDFDocument(Base):
     __tablename__ = "pdf_documents"
+    __table_args__ = (
+        sa.Index("ix_pdf_documents_user", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -54,10 +72,34 @@ class PDFDocument(Base):
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     file_size = Column(Integer)      
     page_count = Column(Integer)     
+    status = Column(String, nullable=False, server_default="ready")  # queued, processing, ready, failed
+    content_hash = Column(String(64), index=True)  # SHA-256 of the uploaded bytes
+    # Set on deduplicated uploads: the document whose chunks this one reuses
+    source_pdf_document_id = Column(Integer, ForeignKey("pdf_documents.id"), nullable=True)
+
+    user = relationship("User", back_populates="pdf_documents", lazy="raise_on_sql")
+    pdf_chunks = relationship("PDFChunk", back_populates="pdf_document", lazy="raise_on_sql")
+    chat_sessions_assoc = relationship("ChatSessionPDF", back_populates="pdf_document", lazy="raise_on_sql")
+
+class PDFIngestJob(Base):
+    """Persisted background ingestion job for an uploaded PDF, resumable by stage."""
+    __tablename__ = "pdf_ingest_jobs"
+
+    id = Column(String, primary_key=True)  # UUID string
+    pdf_document_id = Column(Integer, ForeignKey("pdf_documents.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, completed, failed
+    stage = Column(String, nullable=False, default="extract")  # extract, chunk, embed, finalize, done
+    file_path = Column(String)
+    pages_total = Column(Integer, default=0)
+    pages_processed = Column(Integer, default=0)
+    chunks_total = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
-    user = relationship("User", back_populates="pdf_documents")
-    pdf_chunks = relationship("PDFChunk", back_populates="pdf_document")
-    chat_sessions_assoc = relationship("ChatSessionPDF", back_populates="pdf_document")
+    pdf_document = relationship("PDFDocument", lazy="raise_on_sql")
 
 class PDFChunk(Base):
     __tablename__ = "pdf_chunks_metadata" # Renamed to avoid conflict with NeonDB table name
@@ -67,25 +109,45 @@ class PDFChunk(Base):
     chunk_index = Column(Integer) # Order of chunk in the PDF
     neon_db_chunk_id = Column(String, index=True) # Store an ID if NeonDB provides one, or generate one if not
 
-    pdf_document = relationship("PDFDocument", back_populates="pdf_chunks")
+    pdf_document = relationship("PDFDocument", back_populates="pdf_chunks", lazy="raise_on_sql")
 
 class ChatSessionPDF(Base): 
     """Association table to link chat sessions with PDF documents."""
     __tablename__ = "chat_session_pdfs"
+    __table_args__ = (
+        # Also serves lookups of a session's PDFs (leading chat_session_id)
+        sa.UniqueConstraint("chat_session_id", "pdf_document_id", name="uq_chat_session_pdfs_session_pdf"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     chat_session_id = Column(Integer, ForeignKey("chat_sessions.id"))
     pdf_document_id = Column(Integer, ForeignKey("pdf_documents.id"))
     added_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    chat_session = relationship("ChatSession", back_populates="pdf_documents_assoc")
-    pdf_document = relationship("PDFDocument", back_populates="chat_sessions_assoc")
+    chat_session = relationship("ChatSession", back_populates="pdf_documents_assoc", lazy="raise_on_sql")
+    pdf_document = relationship("PDFDocument", back_populates="chat_sessions_assoc", lazy="raise_on_sql")
 
 class DocumentChunk(NeonBase):
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        sa.Index("ix_document_chunks_user_pdf", "user_id", "pdf_document_id"),
+        sa.Index(
+            "ix_document_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"}
+        ),
+        sa.Index("ix_document_chunks_chunk_tsv", "chunk_tsv", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer)          # Typed copies of the metadata ids so filters run in SQL
+    pdf_document_id = Column(Integer)
+    chunk_index = Column(Integer)
     chunk_text = Column(String)
     embedding = Column(Vector(768))
+    # 'simple' config: no stemming or stop words, so identifiers and codes match exactly
+    chunk_tsv = Column(postgresql.TSVECTOR, sa.Computed("to_tsvector('simple', coalesce(chunk_text, ''))", persisted=True))
     document_metadata = Column(postgresql.JSONB(astext_type=Text))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
@@ -1,4 +1,5 @@
-from .embedding_service import get_embedding
+from .embedding_service import get_embedding, get_embeddings
+from .chunking_service import chunk_pages
 from .gemini_service import generate_response_with_gemini_streaming
 from .neon_service import search_neon_chunks
 from .pdf_service import (
@@ -6,4 +7,6 @@ from .pdf_service import (
     list_user_pdfs_handler
 )
 from .tavily_service import fetch_tavily_data
-from .chat_service import chat_stream_handler, get_chat_history_str 
\ No newline at end of file
+from .chat_service import chat_stream_handler
+from .history_service import get_session_history
+from .prompt_service import build_prompt, estimate_tokens
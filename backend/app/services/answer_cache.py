@@ -0,0 +1,77 @@
+import hashlib
+import json
+from dataclasses import dataclass
+import logging
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.chat_models import ChatRequest
+from app.services.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    answer: str
+    search: str  # Web search metadata sent with the original answer ("" outside search mode)
+
+_answers = TTLCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_bytes=settings.ANSWER_CACHE_MAX_BYTES,
+    sizeof=lambda cached: len(cached.answer) + len(cached.search)
+)
+_stores = 0
+_skips = 0
+
+def answer_mode(chat_req: ChatRequest) -> str:
+    return "search" if chat_req.isSearchMode else "chat"
+
+def is_enabled(chat_req: ChatRequest) -> bool:
+    """Whether answers for this request's mode may be served from and stored in the cache."""
+    return settings.ANSWER_CACHE_ENABLED and answer_mode(chat_req) in settings.ANSWER_CACHE_MODES
+
+def cache_key(chat_req: ChatRequest, pdf_ids: list, history: tuple[str, list[tuple[str, str]]]) -> str:
+    """Fingerprints the question and every input that shapes the answer: mode, searched PDFs,
+    retrieval options and the conversation so far."""
+    summary, turns = history
+    fingerprint = {
+        "query": normalize_text(chat_req.query).casefold(),
+        "mode": answer_mode(chat_req),
+        "pdfs": sorted(pdf_ids),
+        "retrieval": [chat_req.vector_weight, chat_req.lexical_weight, chat_req.mmr_lambda],
+        "history": hashlib.sha256(json.dumps([summary, turns]).encode("utf-8")).hexdigest() if turns or summary else "",
+        "model": settings.GEMINI_MODEL,
+    }
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()
+
+def get(key: str) -> CachedAnswer:
+    return _answers.get(key)
+
+def store(key: str, answer: str, search: str):
+    global _stores, _skips
+    if not answer.strip():
+        _skips += 1
+        return
+    _answers.set(key, CachedAnswer(answer=answer, search=search))
+    _stores += 1
+
+def skip():
+    """Counts a cacheable request whose answer was not stored (degraded context or interrupted stream)."""
+    global _skips
+    _skips += 1
+
+def replay_chunks(answer: str):
+    """Splits a cached answer into chunks of about ANSWER_CACHE_REPLAY_CHARS, cut after whitespace."""
+    size = settings.ANSWER_CACHE_REPLAY_CHARS
+    start = 0
+    while start < len(answer):
+        end = min(start + size, len(answer))
+        if end < len(answer):
+            space = answer.rfind(" ", start, end)
+            if space > start:
+                end = space + 1
+        yield answer[start:end]
+        start = end
+
+def answer_cache_stats() -> dict:
+    return {**_answers.stats(), "stores": _stores, "skips": _skips}
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+import httpx
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models import db_models
+import logging
+
+logger = logging.getLogger(__name__)
+
+_http_client: httpx.AsyncClient = None
+_public_keys: dict = {}        # kid -> constructed jose Key, memoized until the next JWKS refresh
+_jwks_fetched_at = 0.0         # time.monotonic() of the last successful fetch
+_jwks_lock = asyncio.Lock()
+_verified_tokens = TTLCache(
+    max_entries=settings.VERIFIED_TOKEN_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.VERIFIED_TOKEN_CACHE_SECONDS
+)
+
+# The app only ever creates users (it never updates or deletes them), so entries simply expire
+_users = TTLCache(max_entries=settings.USER_CACHE_MAX_ENTRIES, ttl_seconds=settings.USER_CACHE_TTL_SECONDS)
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """The request's user as resolved from a Clerk token; a plain value, safe to cache across requests."""
+    id: int
+    clerk_user_id: str
+    email: Optional[str]
+    username: Optional[str]
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=httpx.Timeout(10.0))
+    return _http_client
+
+async def close_auth_client():
+    """Closes the JWKS HTTP client (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def _refresh_jwks():
+    """Fetches the JSON Web Key Set from Clerk and replaces the memoized public keys."""
+    global _public_keys, _jwks_fetched_at
+    from jose import jwk
+
+    response = await _get_http_client().get(settings.CLERK_JWKS_ENDPOINT)
+    response.raise_for_status()
+    keys = {}
+    for key in response.json().get('keys', []):
+        kid = key.get('kid')
+        if kid:
+            keys[kid] = jwk.construct(key, key.get('alg', 'RS256'))
+    _public_keys = keys
+    _jwks_fetched_at = time.monotonic()
+    logger.info(f"Refreshed JWKS: {len(keys)} keys")
+
+async def get_public_key(kid: str):
+    """Returns the public key for a key ID, refreshing the JWKS when stale or when the kid is unknown.
+
+    Refreshes are single-flight: concurrent callers wait on one fetch instead of each
+    issuing their own, so a key rotation costs a single request to Clerk.
+    """
+    age = time.monotonic() - _jwks_fetched_at
+    if kid in _public_keys and age < settings.JWKS_CACHE_TTL_SECONDS:
+        return _public_keys[kid]
+
+    requested_at = time.monotonic()
+    async with _jwks_lock:
+        # Another request may have refreshed while we waited for the lock
+        already_refreshed = _jwks_fetched_at >= requested_at
+        # Unknown kids (possibly forged) may not force refreshes more often than the floor allows
+        recently_refreshed = time.monotonic() - _jwks_fetched_at < settings.JWKS_MIN_REFRESH_SECONDS
+        if not already_refreshed and not (kid not in _public_keys and _public_keys and recently_refreshed):
+            try:
+                await _refresh_jwks()
+            except Exception as e:
+                logger.error(f"Failed to fetch JWKS: {e}")
+                if not _public_keys:
+                    raise HTTPException(status_code=500, detail="Failed to fetch authentication keys")
+                # Keep serving the previously fetched keys until Clerk is reachable again
+
+    if kid in _public_keys:
+        return _public_keys[kid]
+    raise HTTPException(status_code=401, detail="Invalid token key ID")
+
+async def verify_clerk_token(token: str) -> dict:
+    """Verifies a Clerk JWT and returns its payload, reusing recent verifications of the same token."""
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    payload = _verified_tokens.get(token_hash)
+    if payload is not None and payload.get('exp', 0) > time.time():
+        return payload
+
+    from jose import jwt
+    from jose.exceptions import JWTError
+
+    try:
+        headers = jwt.get_unverified_headers(token)
+        kid = headers.get('kid')
+        if not kid:
+            raise HTTPException(status_code=401, detail="Missing key ID in token header")
+
+        public_key = await get_public_key(kid)
+        payload = jwt.decode(
+            token,
+            public_key,
+            algorithms=['RS256'],
+            audience=settings.CLERK_JWT_AUDIENCE,
+            issuer=settings.CLERK_ISSUER
+        )
+    except JWTError as e:
+        logger.error(f"Token verification failed: {e}")
+        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+
+    # Cache only until the token itself expires
+    remaining = payload.get('exp', 0) - time.time()
+    if remaining > 0:
+        _verified_tokens.set(token_hash, payload, ttl_seconds=min(remaining, settings.VERIFIED_TOKEN_CACHE_SECONDS))
+    return payload
+
+async def resolve_user(payload: dict, db: Session) -> AuthenticatedUser:
+    """Maps a verified token payload to the local user, creating the user on first login.
+
+    Results are cached per clerk_user_id, so most requests need no database round trip.
+    First logins use INSERT ... ON CONFLICT DO NOTHING, which stays correct when several
+    requests for a new user race each other.
+    """
+    clerk_user_id = payload.get('sub')
+    if not clerk_user_id:
+        raise HTTPException(status_code=401, detail="User ID not found in token")
+
+    user = _users.get(clerk_user_id)
+    if user is not None:
+        return user
+
+    columns = (db_models.User.id, db_models.User.email, db_models.User.username)
+    result = await db.execute(select(*columns).where(db_models.User.clerk_user_id == clerk_user_id))
+    row = result.first()
+
+    if row is None:
+        result = await db.execute(
+            insert(db_models.User)
+            .values(
+                clerk_user_id=clerk_user_id,
+                username=clerk_user_id.split('_')[-1],  # Basic username from user ID
+                email=payload.get('email')
+            )
+            .on_conflict_do_nothing(index_elements=[db_models.User.clerk_user_id])
+            .returning(*columns)
+        )
+        row = result.first()
+        await db.commit()
+        if row is None:
+            # A concurrent request created the user between our SELECT and INSERT
+            result = await db.execute(select(*columns).where(db_models.User.clerk_user_id == clerk_user_id))
+            row = result.one()
+
+    user = AuthenticatedUser(id=row.id, clerk_user_id=clerk_user_id, email=row.email, username=row.username)
+    _users.set(clerk_user_id, user)
+    return user
+
+def auth_cache_stats() -> dict:
+    return {
+        "jwks_keys": len(_public_keys),
+        "jwks_age_seconds": time.monotonic() - _jwks_fetched_at if _jwks_fetched_at else None,
+        "verified_tokens": _verified_tokens.stats(),
+        "users": _users.stats()
+    }
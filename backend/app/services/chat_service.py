@@ -1,24 +1,28 @@
 from fastapi import HTTPException, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.orm import Session
+import asyncio
+from contextlib import aclosing
 import time
 import json
-from app.services import neon_service, tavily_service, gemini_service, embedding_service
+from app.services import neon_service, tavily_service, gemini_service, embedding_service, pdf_service, prompt_service, history_service, answer_cache
 from app.models.chat_models import ChatRequest
 from app.models import db_models
+from app.core.config import settings
+from app.services.auth_service import AuthenticatedUser
 import logging
 from typing import Optional
 
 logger = logging.getLogger(__name__)
-_anonymous_message_counts = {}
 
 async def chat_stream_handler(
     chat_req: ChatRequest, 
     request: Request, 
     db: Session, 
-    current_user: Optional[db_models.User],
-    anonymous_session_id: Optional[str] = None
+    current_user: Optional[AuthenticatedUser],
+    anonymous_session_id: Optional[str] = None,
+    anonymous_message_count: Optional[int] = None
 ) -> StreamingResponse:
     """Handles the chat stream logic for both authenticated and anonymous users."""
     query = chat_req.query
@@ -30,139 +34,175 @@ async def chat_stream_handler(
         # Authenticated user flow (existing code)
         if session_id:
             session_result = await db.execute(
-                select(db_models.ChatSession).filter(
+                select(db_models.ChatSession.id, db_models.ChatSession.message_count).filter(
                     db_models.ChatSession.id == session_id, 
                     db_models.ChatSession.user_id == current_user.id
                 )
             )
-            chat_session = session_result.scalar_one_or_none()
-            if not chat_session:
+            session_row = session_result.one_or_none()
+            if session_row is None:
                 raise HTTPException(status_code=404, detail="Chat session not found or not owned by user")
             chat_session_id = session_id
+            message_count = session_row.message_count  # Validates the buffered history
             
-            # Retrieve PDFs associated with this session
+            # Retrieve PDFs associated with this session; only fully indexed ones are searchable.
+            # Deduplicated uploads are searched through the chunks of their source document.
             session_pdfs_result = await db.execute(
-                select(db_models.ChatSessionPDF.pdf_document_id).where(
+                pdf_service.pdf_documents_with_source().join(
+                    db_models.ChatSessionPDF,
+                    db_models.ChatSessionPDF.pdf_document_id == db_models.PDFDocument.id
+                ).where(
                     db_models.ChatSessionPDF.chat_session_id == chat_session_id
                 )
             )
-            context_pdfs = [pdf_id for pdf_id, in session_pdfs_result]
+            session_pdfs = session_pdfs_result.all()
+            ready_pdfs = [pdf for pdf in session_pdfs if pdf.status == "ready"]
+            context_pdfs = sorted({pdf.chunk_source_id for pdf in ready_pdfs})
+            context_owner_ids = sorted({pdf.chunk_owner_id for pdf in ready_pdfs})
+            indexing_pdfs = [pdf.filename for pdf in session_pdfs if pdf.status in ("queued", "processing")]
         else:
             # Create new session for authenticated user
-            chat_session = db_models.ChatSession(user_id=current_user.id)
-            db.add(chat_session)
+            session_result = await db.execute(
+                insert(db_models.ChatSession).values(user_id=current_user.id).returning(db_models.ChatSession.id)
+            )
+            chat_session_id = session_result.scalar_one()
             await db.commit()
-            await db.refresh(chat_session)
-            chat_session_id = chat_session.id
+            message_count = 0
             context_pdfs = []
+            indexing_pdfs = []
     else:
         # Anonymous user flow
         chat_session_id = f"anon_{anonymous_session_id}"
         context_pdfs = []
+        indexing_pdfs = []
         
-        # For anonymous users, no need to store in DB, just track in memory or Redis
-        # You could use a lightweight Redis or in-memory store to track anonymous sessions
-        
-    # Continue with the existing code...
-    chat_history_str = await get_chat_history_str(db, chat_session_id) if current_user else ""
-    
-    # PDF context processing
-    pdf_context = ""
+        # Anonymous chats are not stored; their message quota is enforced in the API layer (quota_service)
+
+    # Independent context sources run concurrently, each under its own deadline; a source that is
+    # slow or failing contributes no context instead of delaying the answer
+    timings = {}
+    timed_out = []
+    failed = []
+    stages = {}
+    if current_user:
+        stages["history"] = (
+            history_service.get_session_history(chat_session_id, message_count),
+            settings.RETRIEVAL_HISTORY_TIMEOUT_SECONDS
+        )
     if current_user and context_pdfs:
         # Only authenticated users can access PDFs
-        try:
-            query_embedding = embedding_service.get_embedding(query)
-            
-            # Pass user_id and pdf_ids to ensure proper filtering
-            retrieved_chunks = await neon_service.search_neon_chunks(
-                query_embedding=query_embedding,
-                user_id=current_user.id,
-                pdf_ids=context_pdfs,
-                top_n=5
-            )
-            
-            if retrieved_chunks:
-                pdf_context = "Here are the most relevant sections from your documents:\n\n" + \
-                            "\n\n".join(retrieved_chunks)
-            else:
-                pdf_context = "No relevant information found in the specified documents."
-                
-        except Exception as e:
-            logger.error(f"Error retrieving PDF context: {str(e)}", exc_info=True)
-            pdf_context = "Error retrieving PDF context from your documents."
-    
-    # Search context if requested
-    tavily_context = ""
+        stages["documents"] = (
+            _retrieve_pdf_context(chat_req, current_user.id, context_pdfs, context_owner_ids, timings),
+            settings.RETRIEVAL_DOCUMENTS_TIMEOUT_SECONDS
+        )
     if chat_req.isSearchMode:
-        tavily_info = tavily_service.fetch_tavily_data(query)
-        tavily_context = json.dumps(tavily_info) if isinstance(tavily_info, dict) else str(tavily_info)
-        if not tavily_context:
-            tavily_context = "No additional web info found."
-
-    prompt = f"""
-    You are a helpful assistant. Answer the user's question based on the provided information.
-
-    {chat_req.isSearchMode and f'''
-    **Web Search Results:**
-    {tavily_context}
-    ''' or ''}
-
-    **Document Context:**
-    {pdf_context}
-
-    **Chat History:**
-    {chat_history_str}
-
-    **User Question:** {query}
-
-    Instructions:
-    1. Maintain the conversation flow by referring to previous exchanges when relevant.
-    3. When including code snippets:
-    - Use triple backticks with the language name for syntax highlighting (```python, ```javascript, etc.)
-    - Ensure code is properly indented and follows best practices
-    - Add brief comments explaining key parts of the code
-    - For React code, use ```jsx for proper syntax highlighting
-    4. Provide clear explanations and examples to help the user understand the topic.
-    5. Provide Code examples when possible to help the user implement the solution.
-    6. If you need more information, ask the user for clarification.
-    7. If you need to search the web for more information, let the user know."""
-
-    print(prompt)
-    async def sse_generator():
-        
-        current_count = 0
-        if not current_user and anonymous_session_id:
-            current_count = await get_anonymous_message_count(anonymous_session_id)
+        stages["web"] = (_fetch_web_context(query), settings.RETRIEVAL_WEB_TIMEOUT_SECONDS)
+    tasks = {
+        name: asyncio.create_task(_run_stage(name, coro, timeout, timings, timed_out, failed))
+        for name, (coro, timeout) in stages.items()
+    }
 
+    history = None
+    answer_key = None
+    cached_answer = None
+    results = {}
+    try:
+        # Repeat questions are answered from the answer cache; documents still being indexed would change the answer.
+        # The conversation is part of the cache key, so the key is computed as soon as history is in.
+        if answer_cache.is_enabled(chat_req) and not indexing_pdfs:
+            if "history" in tasks:
+                history = await tasks["history"]
+            if "history" not in timed_out + failed:
+                answer_key = answer_cache.cache_key(chat_req, context_pdfs, history or ("", []))
+                cached_answer = answer_cache.get(answer_key)
+        if cached_answer is None:
+            results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+    finally:
+        # Stages still running are no longer needed: the answer is cached, or the request was cancelled
+        for task in tasks.values():
+            task.cancel()
+    if history is None:
+        history = results.get("history")
+
+    history_summary, history_turns = history or ("", [])
+
+    pdf_context = ""
+    if "documents" in results:
+        pdf_context = results["documents"]
+        if pdf_context is None:
+            pdf_context = "Could not retrieve context from your documents in time." if "documents" in timed_out \
+                else "Error retrieving PDF context from your documents."
+
+    if indexing_pdfs:
+        pdf_context = (pdf_context + "\n\nThese documents are still being indexed and could not be searched yet: " +
+                       ", ".join(indexing_pdfs)).lstrip()
+
+    tavily_context = results.get("web") or ""
+    if cached_answer is not None:
+        tavily_context = cached_answer.search
+    if chat_req.isSearchMode and not tavily_context:
+        tavily_context = "No additional web info found."
+
+    prompt = None if cached_answer is not None else prompt_service.build_prompt(
+        query,
+        history_summary=history_summary,
+        history_turns=history_turns,
+        pdf_context=pdf_context,
+        web_context=tavily_context,
+        search_mode=chat_req.isSearchMode
+    )
+
+    async def answer_chunks():
+        if cached_answer is not None:
+            for chunk_text in answer_cache.replay_chunks(cached_answer.answer):
+                yield chunk_text
+            return
+
+        # Stream the model response
+        async for chunk in gemini_service.generate_response_with_gemini_streaming(prompt):
+            # Parse the chunk and extract text
+            try:
+                chunk_data = json.loads(chunk.removeprefix("data: ").removesuffix("\n\n"))
+                yield chunk_data.get('text', '')
+            except Exception as e:
+                logger.error(f"Error processing chunk: {e}")
+                continue
+
+    async def sse_generator():
         # Send metadata with session ID first
         metadata = {
             "search": tavily_context, 
             "duration": time.time() - start_time, 
+            "timings": timings,
+            "timed_out": timed_out,
+            "failed": failed,
+            "cached": cached_answer is not None,
             "chat_session_id": chat_session_id if current_user else None,
             "anonymous": current_user is None,
-            "message_count": current_count if not current_user else None
+            "message_count": anonymous_message_count if not current_user else None
         }
         yield f"data: {json.dumps({'type': 'metadata', 'data': metadata})}\n\n"
 
         full_answer = ""
+        completed = True
 
-        # Stream the model response
-        async for chunk in gemini_service.generate_response_with_gemini_streaming(prompt):
-            if await request.is_disconnected():
-                logger.info("Client disconnected, stopping stream.")
-                break
-            
-            # Parse the chunk and extract text
-            try:
-                chunk_data = json.loads(chunk.removeprefix("data: ").removesuffix("\n\n"))
-                chunk_text = chunk_data.get('text', '')
+        async with aclosing(answer_chunks()) as chunks:
+            async for chunk_text in chunks:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, stopping stream.")
+                    completed = False
+                    break
                 full_answer += chunk_text
-                
+
                 # Send chunk as SSE
                 yield f"data: {json.dumps({'type': 'content', 'text': chunk_text})}\n\n"
-            except Exception as e:
-                logger.error(f"Error processing chunk: {e}")
-                continue
+
+        if answer_key and cached_answer is None:
+            # Answers built from degraded context or cut short are not reused
+            if completed and not (timed_out or failed):
+                answer_cache.store(answer_key, full_answer, tavily_context if chat_req.isSearchMode else "")
+            else:
+                answer_cache.skip()
 
         # Save messages for authenticated users only
         if current_user:
@@ -184,40 +224,71 @@ async def chat_stream_handler(
                 search_data=search_data_str
             )
             db.add_all([user_message, bot_message])
-            await db.commit()
+            await db.flush()  # Assigns the message ids kept in the history buffer
+            await db.execute(
+                update(db_models.ChatSession)
+                .where(db_models.ChatSession.id == chat_session_id)
+                .values(
+                    message_count=db_models.ChatSession.message_count + 2,
+                    last_message_at=func.now()
+                )
+            )
+            try:
+                await history_service.append_messages(db, chat_session_id, [user_message, bot_message])
+                await db.commit()
+            except Exception:
+                history_service.forget_session(chat_session_id)
+                raise
         
         # Send completion notification
         yield f"data: {json.dumps({'type': 'end'})}\n\n"
 
     return StreamingResponse(sse_generator(), media_type="text/event-stream")
 
-async def get_chat_history_str(db: Session, chat_session_id: int) -> str:
-    """Retrieves and formats chat history as a string."""
+async def _run_stage(name: str, coro, timeout: float, timings: dict, timed_out: list, failed: list):
+    """Awaits one retrieval stage under its deadline, recording its duration; returns None if it timed out or failed.
 
-    from sqlalchemy import select as sqlalchemy_select
-    chat_history = []
-    if chat_session_id:
-        query = sqlalchemy_select(db_models.ChatMessage).where(
-            db_models.ChatMessage.session_id == chat_session_id
-        ).order_by(db_models.ChatMessage.created_at.desc()).limit(10)
-        
-        # Execute the query
-        messages_result = await db.execute(query)
-        messages = messages_result.scalars().all()
-        messages = list(reversed(messages))
-        
-        for msg in messages:
-            role = "user" if msg.is_user_message else "assistant"
-            chat_history.append(f"{role}: {msg.content}")
-    
-    return "\n".join(chat_history) if chat_history else "No previous messages in this chat."
+    A cancelled stage (its context was no longer needed) records nothing.
+    """
+    started = time.perf_counter()
+    result = None
+    try:
+        result = await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Retrieval stage '{name}' timed out after {timeout}s")
+        timed_out.append(name)
+    except Exception as e:
+        logger.error(f"Retrieval stage '{name}' failed: {str(e)}", exc_info=True)
+        failed.append(name)
+    timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return result
 
+async def _retrieve_pdf_context(chat_req: ChatRequest, user_id: int, pdf_ids: list, owner_ids: list, timings: dict) -> str:
+    started = time.perf_counter()
+    query_embedding = await embedding_service.get_embedding(chat_req.query)
+    timings["embedding"] = round((time.perf_counter() - started) * 1000, 1)
 
-async def get_anonymous_message_count(anonymous_session_id: str) -> int:
-    """Track and return the number of messages sent by an anonymous user."""
-    global _anonymous_message_counts
-    
-    current_count = _anonymous_message_counts.get(anonymous_session_id, 0)
-    _anonymous_message_counts[anonymous_session_id] = current_count + 1
-    
-    return current_count
\ No newline at end of file
+    # Pass user_id and pdf_ids to ensure proper filtering
+    started = time.perf_counter()
+    retrieved_chunks = await neon_service.search_neon_chunks(
+        query_embedding=query_embedding,
+        user_id=user_id,
+        pdf_ids=pdf_ids,
+        top_n=5,
+        owner_ids=owner_ids,
+        query_text=chat_req.query,
+        vector_weight=chat_req.vector_weight,
+        lexical_weight=chat_req.lexical_weight,
+        mmr_lambda=chat_req.mmr_lambda
+    )
+    timings["document_search"] = round((time.perf_counter() - started) * 1000, 1)
+
+    if not retrieved_chunks:
+        return "No relevant information found in the specified documents."
+    return "Here are the most relevant sections from your documents:\n\n" + "\n\n".join(retrieved_chunks)
+
+async def _fetch_web_context(query: str) -> str:
+    tavily_info = await tavily_service.fetch_tavily_data(query)
+    if not tavily_info:
+        raise RuntimeError("Tavily search returned no data")
+    return json.dumps(tavily_info, ensure_ascii=False)
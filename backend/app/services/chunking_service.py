@@ -0,0 +1,80 @@
+import re
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\S+")
+
+class PageChunker:
+    """Incrementally splits pages into overlapping, token-bounded chunks that remember their page range.
+
+    Pages can be fed one at a time as extraction produces them; chunks are emitted as soon as
+    a full window is available. Tokens are whitespace-delimited words, which keeps chunking
+    free of any tokenizer dependency while staying well under the embedding model's input limit.
+    """
+
+    def __init__(self, max_tokens: int = None, overlap_tokens: int = None):
+        self.max_tokens = max_tokens or settings.PDF_CHUNK_TOKENS
+        self.overlap_tokens = settings.PDF_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        if self.overlap_tokens >= self.max_tokens:
+            raise ValueError("Chunk overlap must be smaller than the chunk size")
+        self.step = self.max_tokens - self.overlap_tokens
+        self.page_count = 0
+        self.chunk_count = 0
+        self.token_count = 0
+        # Buffered (word, page_number) pairs from the start of the next window onwards
+        self._words: list[str] = []
+        self._pages_of_words: list[int] = []
+
+    def add_page(self, page_text: str) -> list[dict]:
+        """Adds the next page (1-based numbering is implied by call order) and returns completed chunks."""
+        self.page_count += 1
+        page_words = _TOKEN_RE.findall(page_text.replace('\x00', ''))
+        self._words.extend(page_words)
+        self._pages_of_words.extend([self.page_count] * len(page_words))
+        self.token_count += len(page_words)
+
+        chunks = []
+        # A window ending exactly at the buffer end is deferred: it may be the final chunk
+        while len(self._words) > self.max_tokens:
+            chunks.append(self._emit(self.max_tokens))
+            self._advance()
+        return chunks
+
+    def finish(self) -> list[dict]:
+        """Flushes the remaining buffered words as the final chunk(s)."""
+        chunks = []
+        while self._words:
+            end = min(self.max_tokens, len(self._words))
+            chunks.append(self._emit(end))
+            if end == len(self._words):
+                break
+            self._advance()
+        self._words, self._pages_of_words = [], []
+        logger.info(f"Split {self.page_count} pages ({self.token_count} tokens) into {self.chunk_count} chunks")
+        return chunks
+
+    def _emit(self, end: int) -> dict:
+        chunk = {
+            "chunk_index": self.chunk_count,
+            "text": " ".join(self._words[:end]),
+            "page_start": self._pages_of_words[0],
+            "page_end": self._pages_of_words[end - 1],
+            "token_count": end,
+        }
+        self.chunk_count += 1
+        return chunk
+
+    def _advance(self):
+        del self._words[:self.step]
+        del self._pages_of_words[:self.step]
+
+def chunk_pages(pages: list[str], max_tokens: int = None, overlap_tokens: int = None) -> list[dict]:
+    """Splits page texts into overlapping, token-bounded chunks that remember their page range."""
+    chunker = PageChunker(max_tokens, overlap_tokens)
+    chunks = []
+    for page_text in pages:
+        chunks.extend(chunker.add_page(page_text))
+    chunks.extend(chunker.finish())
+    return chunks
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+import logging
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Normalizes query text so trivially different spellings share a cache entry."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class _SQLiteVectorStore:
+    """Persistent embedding tier backed by a local SQLite file so the cache survives restarts.
+
+    Expired rows, and the oldest rows beyond max_rows, are purged on open and then at most
+    once per PURGE_INTERVAL_SECONDS from set().
+    """
+
+    PURGE_INTERVAL_SECONDS = 60
+
+    def __init__(self, path: str, ttl_seconds: float, max_rows: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_created_at ON embeddings (created_at)")
+        self._conn.commit()
+        self._last_purge = 0.0
+        self.purge_expired()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE key = ? AND created_at > ?",
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return array("f", row[0]) if row else None
+
+    def set(self, key: str, vector: array):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, vector.tobytes(), now)
+            )
+            self._conn.commit()
+        if now - self._last_purge > self.PURGE_INTERVAL_SECONDS:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Deletes expired rows and the oldest rows beyond max_rows; returns how many were removed."""
+        with self._lock:
+            self._last_purge = time.time()
+            expired = self._conn.execute(
+                "DELETE FROM embeddings WHERE created_at <= ?", (self._last_purge - self.ttl_seconds,)
+            ).rowcount
+            overflow = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,)
+            ).rowcount
+            self._conn.commit()
+        if expired or overflow:
+            logger.info(f"Embedding cache purged {expired} expired and {overflow} overflow rows")
+        return expired + overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+class EmbeddingCache:
+    """Two-tier (memory, optional SQLite) cache of embedding vectors stored as float32 arrays.
+
+    A 768-d vector costs 3 KB as array('f') versus ~25 KB as a list of Python floats.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, persistent_path: str = None, persistent_max_rows: int = 100000):
+        self.memory = TTLCache(
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+            max_bytes=max_bytes,
+            sizeof=lambda vector: vector.itemsize * len(vector)
+        )
+        self.persistent = _SQLiteVectorStore(persistent_path, ttl_seconds, persistent_max_rows) if persistent_path else None
+        self.persistent_hits = 0
+
+    async def get(self, model: str, text: str):
+        """Returns the cached embedding as a list of floats, or None on a miss in every tier."""
+        key = cache_key(model, text)
+        vector = self.memory.get(key)
+        if vector is None and self.persistent is not None:
+            vector = await asyncio.to_thread(self.persistent.get, key)
+            if vector is not None:
+                self.persistent_hits += 1
+                self.memory.set(key, vector)
+        return vector.tolist() if vector is not None else None
+
+    async def set(self, model: str, text: str, embedding: list):
+        key = cache_key(model, text)
+        vector = array("f", embedding)
+        self.memory.set(key, vector)
+        if self.persistent is not None:
+            try:
+                await asyncio.to_thread(self.persistent.set, key, vector)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist embedding cache entry: {e}")
+
+    def invalidate(self, model: str, text: str):
+        self.memory.pop(cache_key(model, text))
+
+    def clear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "persistent_hits": self.persistent_hits}
+
+_cache: EmbeddingCache = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide embedding cache, created from settings on first use."""
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+            ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            persistent_path=settings.EMBEDDING_CACHE_PATH or None,
+            persistent_max_rows=settings.EMBEDDING_CACHE_MAX_ROWS
+        )
+    return _cache
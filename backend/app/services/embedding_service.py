@@ -1,28 +1,166 @@
-import requests
+import asyncio
+import httpx
 from fastapi import HTTPException
 from app.core.config import settings
+from app.services.embedding_cache import get_embedding_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_embedding(text: str) -> list:
-    """Generates embeddings using Jina AI."""
-    url = "https://api.jina.ai/v1/embeddings"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {settings.JINAAI_API_KEY}"
-    }
+_client: httpx.AsyncClient = None
+_batcher = None
+_batch_slots: asyncio.Semaphore = None
+
+def _get_client() -> httpx.AsyncClient:
+    """Returns the shared embedding HTTP client, creating its connection pool on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {settings.JINAAI_API_KEY}"
+            },
+            timeout=httpx.Timeout(settings.EMBEDDING_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.EMBEDDING_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.EMBEDDING_MAX_CONNECTIONS
+            )
+        )
+    return _client
+
+async def close_embedding_client():
+    """Closes the shared embedding HTTP client (called on application shutdown)."""
+    global _client, _batcher
+    if _batcher is not None:
+        await _batcher.drain()
+        _batcher = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def _request_embeddings(batch: list[str]) -> list[list]:
+    """Sends a single embedding request for at most EMBEDDING_BATCH_SIZE inputs."""
     payload = {
-        "input": [text],
-        "model": "jina-embeddings-v2-base-en"
+        "input": batch,
+        "model": settings.EMBEDDING_MODEL
     }
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = await _get_client().post(settings.JINAAI_API_URL, json=payload)
         response.raise_for_status()
         data = response.json()
-        if "data" in data and data["data"]:
-            return data["data"][0]["embedding"]
-        else:
-            raise HTTPException(status_code=500, detail="No embeddings returned from Jina AI API.")
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Jina AI API request failed: {str(e)}")
\ No newline at end of file
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Jina AI API request failed: {str(e)}")
+
+    if not data.get("data") or len(data["data"]) != len(batch):
+        raise HTTPException(status_code=500, detail="No embeddings returned from Jina AI API.")
+    # Jina echoes an index per input; sort on it so output order matches input order
+    return [item["embedding"] for item in sorted(data["data"], key=lambda item: item.get("index", 0))]
+
+async def get_embeddings(texts: list[str]) -> list[list]:
+    """Generates embeddings for many texts, packing them into provider-sized batches sent concurrently."""
+    global _batch_slots
+    if _batch_slots is None:
+        _batch_slots = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENT_BATCHES)
+    batch_size = settings.EMBEDDING_BATCH_SIZE
+    batches = [texts[offset:offset + batch_size] for offset in range(0, len(texts), batch_size)]
+
+    async def request(batch: list[str]) -> list[list]:
+        # Batches beyond the limit wait here rather than queueing for a pooled connection, where they would time out
+        async with _batch_slots:
+            return await _request_embeddings(batch)
+
+    results = await asyncio.gather(*(request(batch) for batch in batches))
+    return [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+async def get_embedding(text: str) -> list:
+    """Generates embeddings using Jina AI, serving repeated queries from the embedding cache."""
+    cache = get_embedding_cache() if settings.EMBEDDING_CACHE_ENABLED else None
+    if cache is not None:
+        cached = await cache.get(settings.EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
+
+    if settings.EMBEDDING_MICROBATCH_WINDOW_MS <= 0:
+        embedding = (await _request_embeddings([text]))[0]
+    else:
+        global _batcher
+        if _batcher is None:
+            _batcher = _MicroBatcher(settings.EMBEDDING_MICROBATCH_WINDOW_MS / 1000, settings.EMBEDDING_BATCH_SIZE)
+        embedding = await _batcher.submit(text)
+
+    if cache is not None:
+        await cache.set(settings.EMBEDDING_MODEL, text, embedding)
+    return embedding
+
+class _MicroBatcher:
+    """Merges single-text embedding calls that arrive within a short window into one upstream request."""
+
+    def __init__(self, window_seconds: float, max_batch_size: int):
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle = None
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str) -> list:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._schedule_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._schedule_flush)
+        return await future
+
+    async def drain(self):
+        """Sends every pending text and waits for requests in flight (used on shutdown)."""
+        while self._pending:
+            await self.flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+    def _schedule_flush(self):
+        # Hold a reference so the flush task is not garbage collected mid-request
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # Callers that gave up (e.g. a timed-out retrieval stage) no longer need their text embedded
+        self._pending = [(text, future) for text, future in self._pending if not future.cancelled()]
+        if not self._pending:
+            return
+
+        # Identical texts in the same window share one input slot; a request carries at most
+        # max_batch_size inputs and whatever does not fit goes out in a follow-up flush
+        unique_texts = []
+        seen = set()
+        taken = 0
+        for text, _ in self._pending:
+            if text not in seen:
+                if len(unique_texts) == self.max_batch_size:
+                    break
+                seen.add(text)
+                unique_texts.append(text)
+            taken += 1
+        pending, self._pending = self._pending[:taken], self._pending[taken:]
+        if self._pending:
+            self._schedule_flush()
+
+        try:
+            embeddings = await _request_embeddings(unique_texts)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug(f"Micro-batched {len(pending)} embedding calls into one request of {len(unique_texts)} inputs")
+        by_text = dict(zip(unique_texts, embeddings))
+        for text, future in pending:
+            if not future.done():
+                future.set_result(by_text[text])
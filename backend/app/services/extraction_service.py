@@ -0,0 +1,174 @@
+import asyncio
+import mmap
+import signal
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator
+from fastapi import HTTPException
+from app.core.config import settings
+
+try:
+    import resource  # POSIX only; CPU limits are skipped where unavailable
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_executor: ProcessPoolExecutor = None
+
+# Seconds a task may keep running after its CPU limit before the worker process is killed
+_CPU_LIMIT_GRACE_SECONDS = 2
+
+class CPULimitExceeded(BaseException):
+    """Raised inside a worker when its task reaches the CPU limit.
+
+    A BaseException, so per-page error handling does not swallow it; the task fails on its own
+    instead of the kernel killing the worker, which would break the pool for every other task.
+    """
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.PDF_EXTRACT_PROCESSES)
+    return _executor
+
+def shutdown_extraction_pool():
+    """Stops the extraction worker processes (called on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _discard_broken_executor(executor: ProcessPoolExecutor):
+    # A killed worker breaks the whole pool; the next call starts a fresh one. Every task of the
+    # broken pool lands here, so only the first discards it (not a fresh pool created meanwhile).
+    global _executor
+    if _executor is executor:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _on_cpu_limit(signum, frame):
+    # SIGXCPU repeats every second past the soft limit; if the exception has not ended the task by
+    # the end of the grace period (e.g. stuck in C code), the default action kills the worker
+    signal.signal(signal.SIGXCPU, signal.SIG_DFL)
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    grace_limit = soft + _CPU_LIMIT_GRACE_SECONDS
+    if hard != resource.RLIM_INFINITY:
+        grace_limit = min(grace_limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (grace_limit, hard))
+    raise CPULimitExceeded()
+
+def _run_with_cpu_limit(cpu_seconds: float, fn, *args):
+    """Runs fn in the worker process, raising CPULimitExceeded (via SIGXCPU) past cpu_seconds of CPU time."""
+    if resource is None:
+        return fn(*args)
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    limit = int(used + max(cpu_seconds, 1)) + 1
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    previous_handler = signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    try:
+        return fn(*args)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        signal.signal(signal.SIGXCPU, previous_handler)
+
+def _open_pdf(file_path: str):
+    """Opens the PDF as a read-only memory map, so the parser reads pages without a bytes copy."""
+    with open(file_path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _count_pages(file_path: str) -> int:
+    from PyPDF2 import PdfReader
+
+    with _open_pdf(file_path) as view:
+        return len(PdfReader(view).pages)
+
+def _extract_page_range(file_path: str, start: int, end: int) -> tuple[list[str], float]:
+    """Extracts pages [start, end) and returns their texts plus the CPU seconds spent."""
+    from PyPDF2 import PdfReader
+
+    started = time.process_time()
+    page_texts = []
+    with _open_pdf(file_path) as view:
+        reader = PdfReader(view)
+        for page_number in range(start, end):
+            try:
+                page_text = reader.pages[page_number].extract_text() or ""
+            except Exception as e:
+                logger.warning(f"Error extracting text from page {page_number + 1}: {str(e)}")
+                page_text = ""
+            page_texts.append(page_text)
+    return page_texts, time.process_time() - started
+
+async def _submit(cpu_seconds: float, fn, *args):
+    """Runs fn in the pool under a CPU limit; a task caught in a broken pool is retried once on its own."""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    try:
+        return await loop.run_in_executor(executor, _run_with_cpu_limit, cpu_seconds, fn, *args)
+    except CPULimitExceeded:
+        raise HTTPException(status_code=422, detail="PDF parsing exceeded its CPU time limit")
+    except BrokenProcessPool:
+        _discard_broken_executor(executor)
+        logger.warning(f"Extraction pool broke while running {fn.__name__}; retrying it in a separate process")
+
+    # Alone in a one-off process: if this task is the one killing its worker, it only fails itself
+    isolated = ProcessPoolExecutor(max_workers=1)
+    try:
+        return await loop.run_in_executor(isolated, _run_with_cpu_limit, cpu_seconds, fn, *args)
+    except (CPULimitExceeded, BrokenProcessPool):
+        raise HTTPException(status_code=422, detail="PDF parsing exceeded its CPU time limit")
+    finally:
+        isolated.shutdown(wait=False)
+
+async def iter_pdf_pages(file_path: str) -> AsyncIterator[tuple[int, int, str]]:
+    """Extracts a PDF in worker processes, yielding (page_number, page_count, text) in page order.
+
+    Large documents are split into page ranges parsed in parallel; pages are yielded as soon as
+    their range finishes, so callers can start chunking before the whole file is parsed. The
+    document as a whole may use at most PDF_EXTRACT_CPU_SECONDS of CPU time: the budget not yet
+    used or reserved is split evenly across the ranges submitted together, and a finished range
+    returns whatever part of its share it did not use.
+    """
+    cpu_budget = float(settings.PDF_EXTRACT_CPU_SECONDS)
+    page_count = await _submit(cpu_budget, _count_pages, file_path)
+
+    if page_count > settings.PDF_EXTRACT_PARALLEL_THRESHOLD:
+        range_size = settings.PDF_EXTRACT_PAGES_PER_TASK
+    else:
+        range_size = max(page_count, 1)
+    ranges = deque((start, min(start + range_size, page_count)) for start in range(0, page_count, range_size))
+
+    in_flight = deque()
+    cpu_used = 0.0
+    cpu_reserved = 0.0  # Shares handed to ranges still in flight
+    try:
+        while ranges or in_flight:
+            # Keep at most one range per worker process in flight so the budget stays meaningful
+            free_slots = min(len(ranges), settings.PDF_EXTRACT_PROCESSES - len(in_flight))
+            available = cpu_budget - cpu_used - cpu_reserved
+            if free_slots and available > 0:
+                share = available / free_slots
+                for _ in range(free_slots):
+                    start, end = ranges.popleft()
+                    cpu_reserved += share
+                    in_flight.append((start, share, asyncio.ensure_future(_submit(share, _extract_page_range, file_path, start, end))))
+            elif free_slots and not in_flight:
+                raise HTTPException(status_code=422, detail="PDF parsing exceeded its CPU time limit")
+
+            start, share, future = in_flight.popleft()
+            page_texts, cpu_seconds = await future
+            cpu_reserved -= share
+            cpu_used += cpu_seconds
+            for offset, page_text in enumerate(page_texts):
+                yield start + offset + 1, page_count, page_text
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
@@ -1,31 +1,100 @@
 import asyncio
+import concurrent.futures
 import json
-import google.generativeai as genai
+import threading
+import time
 from fastapi import HTTPException
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-genai.configure(api_key=settings.GEMINI_API_KEY) # Configure Gemini API key
-model = genai.GenerativeModel("gemini-2.0-flash")
-
-def generate_response_with_gemini_streaming(prompt: str):
-    """Calls Google Gemini API and returns a streaming response."""
-
-    response_stream = model.generate_content(
-        prompt,
-        stream=True,
-        generation_config={
-            "temperature": 0.3,
-            "max_output_tokens": 3072,
-            "response_mime_type": "text/plain"
-        },
-    )
-
-    async def text_streamer():
-        for chunk in response_stream:
-            if chunk.text:
-                yield f"data: {json.dumps({'type': 'answer_chunk', 'text': chunk.text})}\n\n"
-            await asyncio.sleep(0.01)
-    return text_streamer()
\ No newline at end of file
+_model = None
+_model_lock = threading.Lock()
+
+def _get_model():
+    """Configures the Gemini SDK and builds the model on first use; the SDK is slow to import."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            import google.generativeai as genai
+
+            if settings.GEMINI_API_ENDPOINT:
+                genai.configure(
+                    api_key=settings.GEMINI_API_KEY,
+                    transport="rest",
+                    client_options={"api_endpoint": settings.GEMINI_API_ENDPOINT}
+                )
+            else:
+                genai.configure(api_key=settings.GEMINI_API_KEY) # Configure Gemini API key
+            _model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    return _model
+
+GENERATION_CONFIG = {
+    "temperature": 0.3,
+    "max_output_tokens": 3072,
+    "response_mime_type": "text/plain"
+}
+
+async def generate_response_with_gemini_streaming(prompt: str):
+    """Calls Google Gemini API and yields the response as SSE-formatted chunks.
+
+    The SDK's streaming iterator blocks on network reads, so it runs on a dedicated thread
+    that feeds a bounded asyncio.Queue; the event loop only awaits the queue, and a slow
+    consumer makes the producer wait instead of buffering the whole answer.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.GEMINI_STREAM_QUEUE_SIZE)
+    stop = threading.Event()
+    started = time.perf_counter()
+
+    def put(item) -> bool:
+        # Blocks this thread while the queue is full (backpressure) but gives up once the consumer is gone.
+        # The put is submitted once and waited on; resubmitting after a timeout could enqueue a chunk twice.
+        try:
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        except RuntimeError:  # Event loop closed
+            return False
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                # Only a cancelled put is dropped; if cancel() loses the race the put completed
+                if stop.is_set() and future.cancel():
+                    return False
+            except concurrent.futures.CancelledError:
+                return False
+
+    def produce():
+        try:
+            response_stream = _get_model().generate_content(prompt, stream=True, generation_config=GENERATION_CONFIG)
+            for chunk in response_stream:
+                try:
+                    text = chunk.text
+                except ValueError:  # Chunk without text parts (e.g. a finish or safety frame)
+                    continue
+                if text and not put(("text", text)):
+                    return
+        except Exception as e:
+            put(("error", e))
+            return
+        put(("end", None))
+
+    threading.Thread(target=produce, name="gemini-stream", daemon=True).start()
+
+    first_token_at = None
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "end":
+                break
+            if kind == "error":
+                raise value
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                logger.info(f"Gemini time to first token: {(first_token_at - started) * 1000:.0f} ms")
+            yield f"data: {json.dumps({'type': 'answer_chunk', 'text': value})}\n\n"
+    finally:
+        stop.set()
+        logger.info(f"Gemini stream finished in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,141 @@
+from collections import deque
+from dataclasses import dataclass, field
+import logging
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models import db_models
+from app.services import prompt_service
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SessionHistory:
+    """Rolling summary plus a ring buffer of the most recent (message_id, role, content) turns."""
+    summary: str = ""
+    summarized_message_id: int = 0
+    turns: deque = field(default_factory=deque)
+    message_count: int = 0  # ChatSession.message_count this buffer reflects
+
+    def fold_overflow(self) -> bool:
+        """Moves turns beyond the verbatim window into the summary; returns True if the summary changed."""
+        overflow = []
+        while len(self.turns) > settings.PROMPT_RECENT_MESSAGES:
+            overflow.append(self.turns.popleft())
+        if not overflow:
+            return False
+        self.summary = prompt_service.extend_summary(
+            self.summary, [prompt_service.summarize_message(role, content) for _, role, content in overflow]
+        )
+        self.summarized_message_id = overflow[-1][0]
+        return True
+
+    def prompt_turns(self) -> list[tuple[str, str]]:
+        return [(role, content) for _, role, content in self.turns]
+
+def _sizeof(history: SessionHistory) -> int:
+    # Approximate footprint: the text itself plus per-turn tuple/str overhead
+    return len(history.summary) + sum(len(content) + 120 for _, _, content in history.turns) + 200
+
+# Per-process; entries are checked against the ChatSession.message_count the caller read, so
+# messages written through another worker make the entry reload instead of silently going missing
+_sessions = TTLCache(
+    max_entries=settings.HISTORY_CACHE_MAX_SESSIONS,
+    ttl_seconds=settings.HISTORY_CACHE_IDLE_SECONDS,
+    max_bytes=settings.HISTORY_CACHE_MAX_BYTES,
+    sizeof=_sizeof
+)
+
+async def get_session_history(chat_session_id: int, message_count: int) -> tuple[str, list[tuple[str, str]]]:
+    """Returns the session's rolling summary and recent turns; active sessions are served from memory.
+
+    message_count is the session's ChatSession.message_count as the caller already read it (the
+    chat handler loads the session row anyway), so a buffered entry is validated without a query.
+    If the counter moved (another worker wrote to the session), the history is reloaded.
+    """
+    history = _sessions.get(chat_session_id)
+    if history is not None and history.message_count == message_count:
+        return history.summary, history.prompt_turns()
+    if message_count == 0:
+        history = SessionHistory()  # New session: nothing stored yet
+    else:
+        # Own session, so the history queries can run alongside the other retrieval stages
+        async with AsyncSessionLocal() as db:
+            history = await _load_session_history(db, chat_session_id)
+    _sessions.set(chat_session_id, history)
+    return history.summary, history.prompt_turns()
+
+async def _load_session_history(db: Session, chat_session_id: int) -> SessionHistory:
+    """Reads the stored summary and the messages after it, folding any that left the verbatim window."""
+    session_result = await db.execute(
+        select(
+            db_models.ChatSession.history_summary,
+            db_models.ChatSession.summarized_message_id,
+            db_models.ChatSession.message_count
+        )
+        .where(db_models.ChatSession.id == chat_session_id)
+    )
+    session_row = session_result.one_or_none()
+    if not session_row:
+        return SessionHistory()
+    history = SessionHistory(
+        summary=session_row.history_summary or "",
+        summarized_message_id=session_row.summarized_message_id or 0,
+        # Read before the messages: a write landing in between leaves the count behind, which only forces a reload
+        message_count=session_row.message_count or 0
+    )
+    previous_summarized_id = history.summarized_message_id
+
+    messages_result = await db.execute(
+        select(db_models.ChatMessage.id, db_models.ChatMessage.is_user_message, db_models.ChatMessage.content)
+        .where(
+            db_models.ChatMessage.session_id == chat_session_id,
+            db_models.ChatMessage.id > history.summarized_message_id
+        )
+        .order_by(db_models.ChatMessage.id.desc())
+        .limit(settings.PROMPT_RECENT_MESSAGES + settings.PROMPT_SUMMARY_MAX_BACKFILL)
+    )
+    for msg in reversed(messages_result.all()):
+        history.turns.append((msg.id, "user" if msg.is_user_message else "assistant", msg.content))
+
+    if history.fold_overflow():
+        await db.execute(_summary_update(chat_session_id, previous_summarized_id, history))
+        await db.commit()
+    return history
+
+def _summary_update(chat_session_id: int, previous_summarized_id: int, history: SessionHistory):
+    # Guarded on the previous position, so a concurrent writer that already advanced it wins
+    return (
+        update(db_models.ChatSession)
+        .where(
+            db_models.ChatSession.id == chat_session_id,
+            func.coalesce(db_models.ChatSession.summarized_message_id, 0) == previous_summarized_id
+        )
+        .values(history_summary=history.summary, summarized_message_id=history.summarized_message_id)
+    )
+
+async def append_messages(db: Session, chat_session_id: int, messages: list[db_models.ChatMessage]):
+    """Appends flushed messages to a cached session's ring buffer.
+
+    If older turns fall out of the verbatim window, the summary update is added to the caller's
+    transaction, so it commits together with the messages.
+    """
+    history = _sessions.get(chat_session_id)
+    if history is None:
+        return  # Not cached: the next read loads (and folds) from the database
+    previous_summarized_id = history.summarized_message_id
+    for msg in messages:
+        history.turns.append((msg.id, "user" if msg.is_user_message else "assistant", msg.content))
+    history.message_count += len(messages)  # Mirrors the caller's message_count increment
+    if history.fold_overflow():
+        await db.execute(_summary_update(chat_session_id, previous_summarized_id, history))
+    _sessions.set(chat_session_id, history)  # Re-measures the entry against the memory cap
+
+def forget_session(chat_session_id: int):
+    """Drops a session's cached history (e.g. after it is deleted)."""
+    _sessions.pop(chat_session_id)
+
+def history_cache_stats() -> dict:
+    return _sessions.stats()
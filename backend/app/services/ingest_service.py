@@ -0,0 +1,356 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+import logging
+from fastapi import HTTPException
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, NeonAsyncSessionLocal
+from app.models import db_models
+from app.services import embedding_service, chunking_service, extraction_service
+
+logger = logging.getLogger(__name__)
+
+_queue: asyncio.Queue = None
+_workers: list[asyncio.Task] = []
+_sweeper: asyncio.Task = None
+_running: set[str] = set()  # Jobs claimed by this process
+
+def _job_file(job_id: str, suffix: str) -> str:
+    return os.path.join(settings.PDF_JOB_DIR, f"{job_id}{suffix}")
+
+async def create_ingest_job(upload_path: str, file_size: int, content_hash: str, filename: str, user_id: int, db: Session) -> dict:
+    """Persists a queued job for a streamed upload, then hands the job to the worker pool."""
+    pdf_document = db_models.PDFDocument(
+        user_id=user_id,
+        filename=filename,
+        file_size=file_size,
+        content_hash=content_hash,
+        status="queued"
+    )
+    db.add(pdf_document)
+    await db.flush()
+
+    job_id = str(uuid.uuid4())
+    file_path = _job_file(job_id, ".pdf")
+    os.replace(upload_path, file_path)  # Same directory, so this is a rename rather than a copy
+
+    job = db_models.PDFIngestJob(
+        id=job_id,
+        pdf_document_id=pdf_document.id,
+        user_id=user_id,
+        status="queued",
+        stage="extract",
+        file_path=file_path
+    )
+    db.add(job)
+    try:
+        await db.commit()
+    except Exception:
+        # No job row points at the moved file, so nothing would ever clean it up
+        os.remove(file_path)
+        raise
+    await db.refresh(pdf_document)
+
+    enqueue_job(job_id)
+    return {
+        "id": pdf_document.id,
+        "filename": filename,
+        "upload_date": pdf_document.upload_date,
+        "status": pdf_document.status,
+        "job_id": job_id,
+        "deduplicated": False,
+        "message": "PDF uploaded and queued for processing"
+    }
+
+async def get_job_status(job_id: str, user_id: int, db: Session) -> dict:
+    """Returns the progress of an ingestion job owned by the user."""
+    result = await db.execute(
+        select(db_models.PDFIngestJob).where(
+            db_models.PDFIngestJob.id == job_id,
+            db_models.PDFIngestJob.user_id == user_id
+        )
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return {
+        "id": job.id,
+        "pdf_document_id": job.pdf_document_id,
+        "status": job.status,
+        "stage": job.stage,
+        "pages_total": job.pages_total,
+        "pages_processed": job.pages_processed,
+        "chunks_total": job.chunks_total,
+        "chunks_embedded": job.chunks_embedded,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+
+def enqueue_job(job_id: str):
+    if _queue is None:
+        logger.warning(f"Ingestion workers not running; job {job_id} will be picked up on next startup")
+        return
+    _queue.put_nowait(job_id)
+
+async def start_ingest_workers():
+    """Starts the bounded worker pool and the stale-job sweep; jobs left by a previous process are requeued separately."""
+    global _queue, _sweeper
+    _queue = asyncio.Queue()
+    for worker_number in range(settings.PDF_INGEST_WORKERS):
+        _workers.append(asyncio.create_task(_worker(worker_number)))
+    _sweeper = asyncio.create_task(_sweep_stale_jobs())
+    logger.info(f"Started {settings.PDF_INGEST_WORKERS} ingestion workers")
+
+async def requeue_pending_jobs():
+    """Requeues jobs left queued or running by a previous process (called once the database is reachable)."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(db_models.PDFIngestJob.id)
+            .where(db_models.PDFIngestJob.status.in_(["queued", "running"]))
+            .order_by(db_models.PDFIngestJob.created_at)
+        )
+        pending = result.scalars().all()
+    for job_id in pending:
+        _queue.put_nowait(job_id)
+    logger.info(f"{len(pending)} pending ingestion jobs requeued")
+
+async def stop_ingest_workers():
+    """Cancels the workers and hands the jobs they were running back to the queue for the next process."""
+    global _queue, _sweeper
+    tasks = _workers + ([_sweeper] if _sweeper else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _workers.clear()
+    _sweeper = None
+    _queue = None
+
+    if _running:
+        interrupted = list(_running)
+        _running.clear()
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(db_models.PDFIngestJob)
+                    .where(db_models.PDFIngestJob.id.in_(interrupted), db_models.PDFIngestJob.status == "running")
+                    .values(status="queued")
+                    .returning(db_models.PDFIngestJob.pdf_document_id)
+                )
+                await db.execute(
+                    update(db_models.PDFDocument)
+                    .where(db_models.PDFDocument.id.in_(result.scalars().all()))
+                    .values(status="queued")
+                )
+                await db.commit()
+            logger.info(f"Requeued {len(interrupted)} interrupted ingestion jobs")
+        except Exception as e:
+            # They are still picked up by the stale-job sweep once PDF_JOB_STALE_SECONDS pass
+            logger.error(f"Could not requeue interrupted ingestion jobs: {str(e)}")
+
+async def _sweep_stale_jobs():
+    """Periodically requeues running jobs that stopped making progress, e.g. after a crashed process."""
+    while True:
+        await asyncio.sleep(settings.PDF_JOB_STALE_SECONDS)
+        try:
+            stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.PDF_JOB_STALE_SECONDS)
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(db_models.PDFIngestJob.id).where(
+                        db_models.PDFIngestJob.status == "running",
+                        db_models.PDFIngestJob.updated_at < stale_before
+                    )
+                )
+                stale = [job_id for job_id in result.scalars().all() if job_id not in _running]
+            for job_id in stale:
+                _queue.put_nowait(job_id)  # _claim_job re-checks staleness atomically
+            if stale:
+                logger.info(f"Requeued {len(stale)} stale ingestion jobs")
+        except Exception as e:
+            logger.error(f"Stale ingestion job sweep failed: {str(e)}")
+
+async def _worker(worker_number: int):
+    while True:
+        job_id = await _queue.get()
+        try:
+            await run_job(job_id)
+        except Exception as e:
+            logger.error(f"Ingestion worker {worker_number} failed on job {job_id}: {e}", exc_info=True)
+        finally:
+            _queue.task_done()
+
+async def _claim_job(job_id: str, db: Session) -> bool:
+    """Atomically marks a job as running unless another worker holds a fresh claim on it."""
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.PDF_JOB_STALE_SECONDS)
+    result = await db.execute(
+        update(db_models.PDFIngestJob)
+        .where(
+            db_models.PDFIngestJob.id == job_id,
+            or_(
+                db_models.PDFIngestJob.status == "queued",
+                (db_models.PDFIngestJob.status == "running") & (db_models.PDFIngestJob.updated_at < stale_before)
+            )
+        )
+        .values(status="running", updated_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def run_job(job_id: str):
+    """Runs (or resumes) extraction -> chunking -> embedding -> finalize for one job."""
+    async with AsyncSessionLocal() as db:
+        if not await _claim_job(job_id, db):
+            logger.info(f"Job {job_id} is finished or claimed by another worker")
+            return
+        _running.add(job_id)
+        try:
+            await _run_claimed_job(job_id, db)
+        except asyncio.CancelledError:
+            raise  # Stays in _running, so stop_ingest_workers hands it back to the queue
+        except Exception:
+            _running.discard(job_id)
+            raise
+        _running.discard(job_id)
+
+async def _run_claimed_job(job_id: str, db: Session):
+    """Runs the stages of a job this process has claimed, recording a failure on the job and its PDF."""
+    job = await db.get(db_models.PDFIngestJob, job_id)
+    pdf_document_id = job.pdf_document_id
+    pdf_document = await db.get(db_models.PDFDocument, pdf_document_id)
+    pdf_document.status = "processing"
+    await db.commit()
+
+    try:
+        chunks = None
+        if job.stage == "extract":
+            chunks = await _extract_stage(job, db)
+        else:
+            # Later stages resume from the chunks checkpoint written by the extract stage
+            chunks = await asyncio.to_thread(_read_json, _job_file(job.id, ".chunks.json"))
+
+        if job.stage == "embed":
+            await _embed_stage(job, pdf_document, chunks, db)
+
+        pdf_document.page_count = job.pages_total
+        pdf_document.status = "ready"
+        job.stage = "done"
+        job.status = "completed"
+        await db.commit()
+        _cleanup_job_files(job.id)
+        logger.info(f"Job {job.id} completed: {job.pages_total} pages, {job.chunks_total} chunks")
+
+    except Exception as e:
+        # Rollback expires the loaded objects, so record the failure with plain UPDATEs
+        await db.rollback()
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        await db.execute(
+            update(db_models.PDFIngestJob)
+            .where(db_models.PDFIngestJob.id == job_id)
+            .values(status="failed", error=e.detail if isinstance(e, HTTPException) else str(e))
+        )
+        await db.execute(
+            update(db_models.PDFDocument)
+            .where(db_models.PDFDocument.id == pdf_document_id)
+            .values(status="failed")
+        )
+        await db.commit()
+
+async def _extract_stage(job: db_models.PDFIngestJob, db: Session) -> list[dict]:
+    """Streams pages out of the extraction pool, chunking them as they arrive and reporting progress."""
+    pages_extracted = 0
+    chunks = []
+    chunker = chunking_service.PageChunker()
+    async for page_number, page_count, page_text in extraction_service.iter_pdf_pages(job.file_path):
+        pages_extracted += 1
+        chunks.extend(chunker.add_page(page_text))
+        if page_number % 10 == 0 or page_number == page_count:
+            job.pages_total = page_count
+            job.pages_processed = page_number
+            await db.commit()
+    chunks.extend(chunker.finish())
+
+    job.pages_total = pages_extracted
+    job.pages_processed = pages_extracted
+    if not chunks:
+        raise HTTPException(status_code=400, detail="No text found in the PDF")
+    await _save_chunks(job, chunks, db)
+    return chunks
+
+async def _save_chunks(job: db_models.PDFIngestJob, chunks: list[dict], db: Session):
+    await asyncio.to_thread(_write_json, _job_file(job.id, ".chunks.json"), chunks)
+    job.chunks_total = len(chunks)
+    job.stage = "embed"
+    await db.commit()
+
+async def _embed_stage(job: db_models.PDFIngestJob, pdf_document: db_models.PDFDocument, chunks: list[dict], db: Session):
+    """Embeds and stores chunks batch by batch; progress is committed with each batch so a restart resumes there."""
+    async with NeonAsyncSessionLocal() as neon_db:
+        # Drop vectors from a batch that was written to Neon but not recorded as progress
+        await neon_db.execute(
+            delete(db_models.DocumentChunk).where(
+                db_models.DocumentChunk.pdf_document_id == pdf_document.id,
+                db_models.DocumentChunk.chunk_index >= job.chunks_embedded
+            )
+        )
+        await neon_db.commit()
+
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        for offset in range(job.chunks_embedded, len(chunks), batch_size):
+            batch = chunks[offset:offset + batch_size]
+            embeddings = await embedding_service.get_embeddings([chunk["text"] for chunk in batch])
+
+            document_chunks = [
+                db_models.DocumentChunk(
+                    user_id=pdf_document.user_id,
+                    pdf_document_id=pdf_document.id,
+                    chunk_index=chunk["chunk_index"],
+                    chunk_text=chunk["text"],
+                    embedding=embedding,
+                    document_metadata={
+                        "pdf_document_id": str(pdf_document.id),
+                        "user_id": str(pdf_document.user_id),
+                        "filename": pdf_document.filename,
+                        "chunk_index": chunk["chunk_index"],
+                        "page_start": chunk["page_start"],
+                        "page_end": chunk["page_end"]
+                    }
+                )
+                for chunk, embedding in zip(batch, embeddings)
+            ]
+            neon_db.add_all(document_chunks)
+            await neon_db.commit()
+
+            db.add_all([
+                db_models.PDFChunk(
+                    pdf_document_id=pdf_document.id,
+                    chunk_index=chunk["chunk_index"],
+                    neon_db_chunk_id=str(document_chunk.id)
+                )
+                for chunk, document_chunk in zip(batch, document_chunks)
+            ])
+            job.chunks_embedded = offset + len(batch)
+            await db.commit()
+
+    job.stage = "finalize"
+    await db.commit()
+
+def _write_json(path: str, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)  # Atomic, so a crash never leaves a half-written checkpoint
+
+def _read_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _cleanup_job_files(job_id: str):
+    for suffix in (".pdf", ".pages.json", ".chunks.json"):  # .pages.json: left by jobs from older versions
+        try:
+            os.remove(_job_file(job_id, suffix))
+        except FileNotFoundError:
+            pass
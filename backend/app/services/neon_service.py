@@ -1,71 +1,225 @@
+import asyncio
 import json
 from fastapi import HTTPException
 from sqlalchemy import select, text
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.models.db_models import DocumentChunk
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def search_neon_chunks(query_embedding: list, user_id: int, pdf_ids: list = None, top_n: int = 5):
-    """Searches NeonDB for similar documents using vector similarity with the <=> operator."""
+# Filler words dropped from lexical queries; the 'simple' text search config keeps every word
+_LEXICAL_STOP_WORDS = frozenset("""
+a an and are as at be but by can do does for from how i in is it me my of on or so that the this
+to was what when where which who why will with you your
+""".split())
+
+async def search_neon_chunks(
+    query_embedding: list,
+    user_id: int,
+    pdf_ids: list = None,
+    top_n: int = 5,
+    owner_ids: list = None,
+    query_text: str = None,
+    vector_weight: float = None,
+    lexical_weight: float = None,
+    mmr_lambda: float = None
+):
+    """Searches NeonDB chunks by vector similarity, fused with full-text matches when query_text is given.
+
+    Chunks are stored under the user who first uploaded the document, so searches that
+    include deduplicated documents pass the owners of their source documents as owner_ids
+    (defaults to the requesting user). Both legs apply the user/PDF filter in SQL and run
+    concurrently; their rankings are merged with weighted reciprocal-rank fusion. Database
+    errors are raised rather than returned as an empty result.
+
+    With mmr_lambda below 1 (default MMR_LAMBDA), a larger candidate pool is fetched with its
+    embeddings and re-ranked by maximal marginal relevance, so near-duplicate adjacent
+    passages do not crowd out the rest of the top_n.
+    """
     try:
-        from app.core.database import NeonAsyncSessionLocal
-        
-        async with NeonAsyncSessionLocal() as neon_db:
-            try:
-                # Simple approach: use <=> operator for cosine similarity
-                query = f"""
-                    SELECT id, chunk_text, document_metadata 
-                    FROM document_chunks
-                    ORDER BY embedding <=> ARRAY{str(query_embedding)}::vector
-                    LIMIT {top_n * 3}
-                """
-                
-                result = await neon_db.execute(text(query))
-                chunks = result.fetchall()
-                await neon_db.commit()  # Explicitly commit successful transaction
-                logger.info(f"Vector search successful, retrieved {len(chunks)} chunks")
-                
-            except Exception as e:
-                await neon_db.rollback()  # Explicitly rollback failed transaction
-                logger.error(f"Vector search query failed: {str(e)}")
-                return []  # Return empty results on failure
-            
-            # Process results
-            filtered_chunks = []
-            for chunk in chunks:
-                try:
-                    metadata = json.loads(chunk.document_metadata)
-                    chunk_user_id = metadata.get('user_id')
-                    chunk_pdf_id = metadata.get('pdf_document_id')
-                    
-                    # Match string representations for consistent comparison
-                    if chunk_user_id != str(user_id):
-                        continue
-                        
-                    if pdf_ids and chunk_pdf_id not in [str(pdf_id) for pdf_id in pdf_ids]:
-                        continue
-                    
-                    # Extract a meaningful preview from the larger text
-                    document_text = chunk.chunk_text
-                    preview_text = document_text[:1000] + "..." if len(document_text) > 1000 else document_text
-                    
-                    filtered_chunks.append({
-                        'text': preview_text,
-                        'metadata': metadata
-                    })
-                    
-                    if len(filtered_chunks) >= top_n:
-                        break
-                        
-                except Exception as e:
-                    logger.error(f"Error processing chunk metadata: {str(e)}")
-            
-            # Format results with source information
-            return [f"[Source: {chunk['metadata'].get('filename', 'Unknown')}]\n{chunk['text']}" 
-                   for chunk in filtered_chunks]
-                   
+        vector_weight = settings.HYBRID_VECTOR_WEIGHT if vector_weight is None else vector_weight
+        lexical_weight = settings.HYBRID_LEXICAL_WEIGHT if lexical_weight is None else lexical_weight
+        use_lexical = bool(query_text and query_text.strip()) and lexical_weight > 0
+        mmr_lambda = settings.MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+        use_mmr = mmr_lambda < 1
+        pool_size = max(top_n, settings.MMR_CANDIDATES) if use_mmr else top_n
+
+        filters = "WHERE user_id = ANY(CAST(:owner_ids AS integer[]))"
+        params = {"owner_ids": owner_ids or [user_id]}
+        if pdf_ids:
+            filters += " AND pdf_document_id = ANY(CAST(:pdf_ids AS integer[]))"
+            params["pdf_ids"] = [int(pdf_id) for pdf_id in pdf_ids]
+
+        relevance = None  # Cosine similarity to the query unless fusion scores are available
+        if not use_lexical:
+            chunks = await _vector_search(filters, params, query_embedding, pool_size, use_mmr)
+        else:
+            candidates = max(top_n * settings.HYBRID_CANDIDATE_MULTIPLIER, pool_size)
+            legs = [_lexical_search(filters, params, query_text, candidates, use_mmr)]
+            if vector_weight > 0:
+                legs.append(_vector_search(filters, params, query_embedding, candidates, use_mmr))
+            rankings = await asyncio.gather(*legs)
+            weights = [lexical_weight, vector_weight]
+            chunks, scores = _reciprocal_rank_fusion(list(zip(rankings, weights)), pool_size)
+            if scores:
+                relevance = [score / scores[0] for score in scores]
+            logger.info(f"Hybrid search fused {[len(ranking) for ranking in rankings]} candidates into {len(chunks)} chunks")
+
+        if use_mmr and len(chunks) > top_n and all(chunk.embedding is not None for chunk in chunks):
+            from app.services import rerank_service  # numpy is only needed once re-ranking runs
+
+            order = rerank_service.mmr_select(
+                query_embedding, [chunk.embedding for chunk in chunks], top_n, mmr_lambda, relevance
+            )
+            chunks = [chunks[i] for i in order]
+        else:
+            chunks = chunks[:top_n]
+
+        # Format results with source information
+        results = []
+        for chunk in chunks:
+            metadata = chunk.document_metadata or {}
+            while isinstance(metadata, str):  # Older rows hold a JSON-encoded string
+                metadata = json.loads(metadata)
+            results.append(
+                f"[Source: {metadata.get('filename', 'Unknown')}{_format_pages(metadata)}]\n{chunk.chunk_text}"
+            )
+        return results
+
     except Exception as e:
+        # Propagated so the caller records the documents stage as failed (and does not cache the answer)
         logger.error(f"Error searching NeonDB documents: {str(e)}", exc_info=True)
-        return []
\ No newline at end of file
+        raise
+
+async def _vector_search(filters: str, params: dict, query_embedding: list, top_n: int, with_embeddings: bool = False) -> list:
+    """Nearest chunks by cosine distance.
+
+    Because HNSW applies filters after collecting ef_search candidates, a pass that comes up
+    short of top_n is followed by a count of the filtered rows (bounded by top_n). The candidate
+    list is widened only while the index returned fewer rows than exist and each pass found more
+    than the last, falling back to an exact scan of the (already filtered) rows if it stalls.
+    """
+    from app.core.database import NeonAsyncSessionLocal
+
+    # The embedding is a bound parameter sent through the binary vector codec registered in
+    # app.core.database, so the statement text is constant and asyncpg prepares it once per connection
+    params = {**params, "embedding": query_embedding, "limit": top_n}
+    query = text(f"""
+        SELECT {_columns(with_embeddings)}
+        FROM document_chunks
+        {filters}
+        ORDER BY embedding <=> CAST(:embedding AS vector)
+        LIMIT :limit
+    """)
+    count_query = text(f"SELECT count(*) FROM (SELECT 1 FROM document_chunks {filters} LIMIT :limit) AS matching")
+
+    async with NeonAsyncSessionLocal() as neon_db:
+        try:
+            ef_search = max(settings.VECTOR_EF_SEARCH, top_n)
+            available = top_n  # Filtered rows, up to top_n; counted only once a pass comes up short
+            previous = -1
+            while True:
+                # SET LOCAL only lasts for the current transaction
+                await neon_db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+                chunks = (await neon_db.execute(query, params)).fetchall()
+                if len(chunks) >= available:
+                    break
+                if previous < 0:
+                    count_params = {name: value for name, value in params.items() if name != "embedding"}
+                    available = (await neon_db.execute(count_query, count_params)).scalar_one()
+                    if len(chunks) >= available:
+                        break  # The filter matches fewer than top_n rows and the index found them all
+                if len(chunks) <= previous or ef_search >= settings.VECTOR_EF_SEARCH_MAX:
+                    break
+                previous = len(chunks)
+                ef_search = min(ef_search * 4, settings.VECTOR_EF_SEARCH_MAX)
+
+            if len(chunks) < available:
+                # Filter is more selective than the index can serve: rank the matching rows exactly
+                await neon_db.execute(text("SET LOCAL enable_indexscan = off"))
+                chunks = (await neon_db.execute(query, params)).fetchall()
+
+            await neon_db.commit()  # Explicitly commit successful transaction
+            logger.info(f"Vector search successful, retrieved {len(chunks)} chunks (ef_search={ef_search})")
+            return chunks
+
+        except Exception as e:
+            await neon_db.rollback()  # Explicitly rollback failed transaction
+            logger.error(f"Vector search query failed: {str(e)}")
+            raise
+
+async def _lexical_search(filters: str, params: dict, query_text: str, top_n: int, with_embeddings: bool = False) -> list:
+    """Chunks matching any query term, ranked by term density (GIN index on chunk_tsv).
+
+    Postgres tokenizes the query with the same 'simple' parser that built chunk_tsv, so
+    identifiers, version strings and paths split the same way on both sides. The lexemes are
+    quoted before being OR-ed, so user input cannot inject tsquery operators.
+    """
+    from app.core.database import NeonAsyncSessionLocal
+
+    params = {
+        **params,
+        "query_text": query_text,
+        "stop_words": sorted(_LEXICAL_STOP_WORDS),
+        "max_terms": settings.HYBRID_MAX_LEXICAL_TERMS,
+        "limit": top_n,
+    }
+    query = text(f"""
+        WITH query AS (
+            SELECT to_tsquery('simple', coalesce(string_agg(term, ' | '), '')) AS tsq
+            FROM (
+                SELECT '''' || replace(replace(lexeme, '\\', '\\\\'), '''', '''''') || '''' AS term
+                FROM unnest(to_tsvector('simple', :query_text))
+                WHERE lexeme <> ALL(CAST(:stop_words AS text[]))
+                ORDER BY positions[1]
+                LIMIT :max_terms
+            ) AS terms
+        )
+        SELECT {_columns(with_embeddings)}
+        FROM document_chunks, query
+        {filters} AND chunk_tsv @@ query.tsq
+        ORDER BY ts_rank_cd(chunk_tsv, query.tsq) DESC
+        LIMIT :limit
+    """)
+
+    async with NeonAsyncSessionLocal() as neon_db:
+        try:
+            chunks = (await neon_db.execute(query, params)).fetchall()
+            await neon_db.commit()
+            logger.info(f"Lexical search successful, retrieved {len(chunks)} chunks")
+            return chunks
+        except Exception as e:
+            await neon_db.rollback()
+            logger.error(f"Lexical search query failed: {str(e)}")
+            raise
+
+def _columns(with_embeddings: bool) -> str:
+    # Embeddings (3 KB each) are only fetched when the caller re-ranks with them
+    return "id, chunk_text, document_metadata, embedding" if with_embeddings else "id, chunk_text, document_metadata, NULL AS embedding"
+
+def _reciprocal_rank_fusion(rankings: list[tuple[list, float]], top_n: int) -> tuple[list, list[float]]:
+    """Merges ranked row lists: each row scores sum(weight / (k + rank)) over the lists it appears in.
+
+    Returns the top_n rows and their fused scores, best first.
+    """
+    scores = {}
+    rows = {}
+    for ranking, weight in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row.id] = scores.get(row.id, 0.0) + weight / (settings.HYBRID_RRF_K + rank)
+            rows[row.id] = row
+    ranked_ids = sorted(scores, key=scores.get, reverse=True)
+    ranked_ids = ranked_ids[:top_n]
+    return [rows[chunk_id] for chunk_id in ranked_ids], [scores[chunk_id] for chunk_id in ranked_ids]
+
+def _format_pages(metadata: dict) -> str:
+    """Formats the page range of a chunk for source labels."""
+    page_start = metadata.get('page_start')
+    page_end = metadata.get('page_end')
+    if not page_start:
+        return ""
+    if page_end and page_end != page_start:
+        return f", pages {page_start}-{page_end}"
+    return f", page {page_start}"
@@ -1,155 +1,146 @@
-import io
-from PyPDF2 import PdfReader
+import asyncio
+import hashlib
+import os
+import tempfile
 from fastapi import HTTPException, UploadFile
 
 from app.models import db_models
-from app.models.db_models import PDFDocument, PDFChunk, DocumentChunk
 from sqlalchemy.orm import Session
-import json
 import logging
-from sqlalchemy import select
-from app.core.database import NeonAsyncSessionLocal
+from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
 
-from app.services import embedding_service
+from app.core.config import settings
+from app.services import ingest_service
+from app.services.auth_service import AuthenticatedUser
 
 logger = logging.getLogger(__name__)
 
+async def receive_pdf_upload(file: UploadFile) -> tuple[str, int, str]:
+    """Streams an upload to a temp file in PDF_JOB_DIR in a single pass.
+
+    The %PDF magic is checked on the first bytes and the size limit as bytes arrive, so an
+    invalid or oversized upload is rejected without ever holding the file in memory.
+    Returns the temp file path, the file size and the SHA-256 of the contents.
+    """
+    os.makedirs(settings.PDF_JOB_DIR, exist_ok=True)
+    fd, upload_path = tempfile.mkstemp(suffix=".upload", dir=settings.PDF_JOB_DIR)
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            await file.seek(0)
+            while True:
+                piece = await file.read(settings.PDF_UPLOAD_READ_BYTES)
+                if not piece:
+                    break
+                if size == 0 and not piece.startswith(b'%PDF'):
+                    raise HTTPException(status_code=400, detail="Invalid PDF format")
+                size += len(piece)
+                if size > settings.PDF_MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File too large (max {settings.PDF_MAX_UPLOAD_BYTES // (1024 * 1024)}MB)"
+                    )
+                digest.update(piece)
+                await asyncio.to_thread(out.write, piece)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Invalid PDF format")
+        return upload_path, size, digest.hexdigest()
+    except BaseException:
+        os.remove(upload_path)
+        raise
+
+async def find_duplicate_pdf(content_hash: str, user_id: int, db: Session) -> Optional[db_models.PDFDocument]:
+    """Finds an already ingested (or ingesting) original with the same bytes, preferring the user's own."""
+    query = select(db_models.PDFDocument).where(
+        db_models.PDFDocument.content_hash == content_hash,
+        db_models.PDFDocument.source_pdf_document_id.is_(None),
+        db_models.PDFDocument.status != "failed"
+    )
+    if settings.PDF_DEDUP_GLOBAL:
+        query = query.order_by((db_models.PDFDocument.user_id == user_id).desc(), db_models.PDFDocument.id)
+    else:
+        query = query.where(db_models.PDFDocument.user_id == user_id).order_by(db_models.PDFDocument.id)
+    result = await db.execute(query.limit(1))
+    return result.scalar_one_or_none()
+
+async def _link_duplicate_pdf(source: db_models.PDFDocument, filename: str, file_size: int, user_id: int, db: Session) -> dict:
+    """Creates a PDFDocument that reuses the chunks of an identical earlier upload."""
+    pdf_document = db_models.PDFDocument(
+        user_id=user_id,
+        filename=filename,
+        file_size=file_size,
+        page_count=source.page_count,
+        content_hash=source.content_hash,
+        source_pdf_document_id=source.id,
+        status=source.status
+    )
+    db.add(pdf_document)
+    await db.commit()
+    await db.refresh(pdf_document)
+    logger.info(f"Upload of {filename} deduplicated against PDF {source.id}")
+    return {
+        "id": pdf_document.id,
+        "filename": filename,
+        "upload_date": pdf_document.upload_date,
+        "status": source.status,
+        "job_id": None,
+        "deduplicated": True,
+        "source_document_id": source.id,
+        "message": "PDF already indexed; reusing the existing content"
+    }
+
+def pdf_documents_with_source():
+    """Selects PDF rows with status, chunk source and chunk owner resolved through any dedup link.
+
+    Deduplicated documents report the status of their source, and their chunks are stored
+    under the source document's id and owner.
+    """
+    source = aliased(db_models.PDFDocument)
+    return select(
+        db_models.PDFDocument.id,
+        db_models.PDFDocument.filename,
+        db_models.PDFDocument.upload_date,
+        func.coalesce(source.status, db_models.PDFDocument.status).label("status"),
+        func.coalesce(source.id, db_models.PDFDocument.id).label("chunk_source_id"),
+        func.coalesce(source.user_id, db_models.PDFDocument.user_id).label("chunk_owner_id")
+    ).outerjoin(source, source.id == db_models.PDFDocument.source_pdf_document_id)
+
 async def process_pdf_and_store(file: UploadFile, user_id: int, db: Session):
-    """Processes PDF, generates embeddings, stores in NeonDB and metadata in PostgreSQL."""
+    """Validates an uploaded PDF and queues it for background extraction, chunking and embedding."""
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
+    upload_path = None
     try:
-        # Reset file pointer and read the content
-        await file.seek(0)
-        pdf_bytes = await file.read()
-        
-        # Basic validation that it's a PDF
-        if not pdf_bytes.startswith(b'%PDF'):
-            raise HTTPException(status_code=400, detail="Invalid PDF format")
-            
-        pdf_stream = io.BytesIO(pdf_bytes)
-        reader = PdfReader(pdf_stream)
-        
-        # Extract text from each page
-        text_parts = []
-        for page in reader.pages:
-            try:
-                text = page.extract_text() or ""
-                text_parts.append(text)
-                logger.info(f"Extracted {len(text)} characters from page")
-            except Exception as e:
-                logger.warning(f"Error extracting text from page: {str(e)}")
-                
-        text = "\n".join(text_parts)
-        sanitized_text = text.replace('\x00', '')
-
-        if not sanitized_text.strip():
-            raise HTTPException(status_code=400, detail="No text found in the PDF")
+        upload_path, file_size, content_hash = await receive_pdf_upload(file)
 
-        # Store PDF Document metadata in PostgreSQL
-        pdf_document_db = db_models.PDFDocument(
-            user_id=user_id, 
-            filename=file.filename,
-            file_size=len(pdf_bytes),
-            page_count=len(reader.pages)
-        )
-        db.add(pdf_document_db)
-        await db.commit()
-        await db.refresh(pdf_document_db)
+        source = await find_duplicate_pdf(content_hash, user_id, db)
+        if source:
+            os.remove(upload_path)
+            return await _link_duplicate_pdf(source, file.filename, file_size, user_id, db)
 
-        pdf_id = pdf_document_db.id  # Save ID before any potential rollback
-        
-        # No chunking - just use the whole document text
-        # Create a NeonDB session
-        neon_db = NeonAsyncSessionLocal()
-        try:
-            # Check if document_chunks table exists in NEON
-            from sqlalchemy import text
-            check_result = await neon_db.execute(text(
-                "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'document_chunks')"
-            ))
-            chunks_table_exists = check_result.scalar()
-            
-            if not chunks_table_exists:
-                logger.error("document_chunks table does not exist in NeonDB")
-                return {
-                    "id": pdf_id,
-                    "filename": file.filename,
-                    "upload_date": pdf_document_db.upload_date,
-                    "page_count": len(reader.pages),
-                    "message": "PDF metadata saved, but vector could not be stored (database issue)",
-                    "warning": "Vector database is not properly configured"
-                }
-            
-            # Process the entire document as one chunk
-            try:
-                # Generate embedding for the entire document
-                embedding = embedding_service.get_embedding(sanitized_text)
-                
-                # Create document chunk in NEON - storing the entire PDF content
-                document_chunk = db_models.DocumentChunk(
-                    chunk_text=sanitized_text,
-                    embedding=embedding,
-                    document_metadata=json.dumps({
-                        "pdf_document_id": str(pdf_id),
-                        "user_id": str(user_id),
-                        "filename": file.filename,
-                        "full_document": "true"  # Flag to indicate this is a whole document
-                    })
-                )
-                neon_db.add(document_chunk)
-                await neon_db.flush()
-                
-                # Store reference in PDF chunks table (in PostgreSQL)
-                pdf_chunk = db_models.PDFChunk(
-                    pdf_document_id=pdf_id,
-                    chunk_index=0,  # Only one chunk now
-                    neon_db_chunk_id=str(document_chunk.id)
-                )
-                db.add(pdf_chunk)
-                logger.info(f"Added full document with ID {document_chunk.id}")
-                
-                # Commit both databases
-                await neon_db.commit()
-                await db.commit()
-                
-            except Exception as e:
-                logger.error(f"Error processing document: {str(e)}", exc_info=True)
-                return {
-                    "id": pdf_id,
-                    "filename": file.filename,
-                    "upload_date": pdf_document_db.upload_date,
-                    "page_count": len(reader.pages),
-                    "message": "PDF metadata saved, but vector processing failed",
-                    "warning": str(e)
-                }
-            
-        finally:
-            # Always close the NeonDB session
-            await neon_db.close()
-        
-        return {
-            "id": pdf_id,
-            "filename": file.filename,
-            "upload_date": pdf_document_db.upload_date,
-            "page_count": len(reader.pages),
-            "message": "PDF uploaded and processed successfully!"
-        }
+        return await ingest_service.create_ingest_job(upload_path, file_size, content_hash, file.filename, user_id, db)
+    except HTTPException:
+        raise
     except Exception as e:
         # Make sure to rollback on failure
         try:
             await db.rollback()
         except:
             pass
+        if upload_path and os.path.exists(upload_path):
+            os.remove(upload_path)
         logger.error(f"Error processing PDF: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
-async def list_user_pdfs_handler(current_user: db_models.User, db: Session) -> list[dict]:
+async def list_user_pdfs_handler(current_user: AuthenticatedUser, db: Session) -> list[dict]:
     """Handler for listing user PDFs, offloaded from route."""
     pdfs = await db.execute(
-        select(db_models.PDFDocument)
+        pdf_documents_with_source()
         .filter(db_models.PDFDocument.user_id == current_user.id)
     )
-    pdfs = pdfs.scalars().all()
-    return [{"id": pdf.id, "filename": pdf.filename, "upload_date": pdf.upload_date} for pdf in pdfs]
+    pdfs = pdfs.all()
+    return [{"id": pdf.id, "filename": pdf.filename, "upload_date": pdf.upload_date, "status": pdf.status} for pdf in pdfs]
@@ -0,0 +1,144 @@
+import re
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_INSTRUCTIONS = """You are a helpful assistant. Answer the user's question based on the provided information.
+
+Instructions:
+1. Maintain the conversation flow by referring to previous exchanges when relevant.
+2. When including code snippets:
+- Use triple backticks with the language name for syntax highlighting (```python, ```javascript, etc.)
+- Ensure code is properly indented and follows best practices
+- Add brief comments explaining key parts of the code
+- For React code, use ```jsx for proper syntax highlighting
+3. Provide clear explanations and examples to help the user understand the topic.
+4. Provide Code examples when possible to help the user implement the solution.
+5. If you need more information, ask the user for clarification.
+6. If you need to search the web for more information, let the user know."""
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+def estimate_tokens(text: str) -> int:
+    """Approximates the model's token count locally: one token per punctuation mark or short
+    word, plus one per further five characters of long words (close to SentencePiece on prose and code)."""
+    if not text:
+        return 0
+    return sum(1 + (len(piece) - 1) // 5 for piece in _PIECE_RE.findall(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text to roughly max_tokens, preferring a line or sentence boundary near the end."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    tokens = 0
+    end = 0
+    for match in _PIECE_RE.finditer(text):
+        piece = match.group()
+        tokens += 1 + (len(piece) - 1) // 5
+        if tokens > max_tokens:
+            break
+        end = match.end()
+    cut = max(text.rfind("\n", 0, end), text.rfind(". ", 0, end) + 1)
+    if cut < end * 0.8:
+        cut = end
+    return text[:cut].rstrip() + " …[truncated]"
+
+def summarize_message(role: str, content: str) -> str:
+    """Extractive one-line digest of a message for the rolling history summary."""
+    text = " ".join((content or "").split())
+    first_sentence = _SENTENCE_END_RE.split(text, 1)[0]
+    return f"- {role}: {truncate_to_tokens(first_sentence, settings.PROMPT_SUMMARY_LINE_TOKENS)}"
+
+def extend_summary(summary: str, lines: list[str]) -> str:
+    """Appends digest lines to a rolling summary, dropping its oldest lines beyond the summary budget."""
+    summary_lines = (summary.splitlines() if summary else []) + lines
+    while len(summary_lines) > 1 and estimate_tokens("\n".join(summary_lines)) > settings.PROMPT_SUMMARY_MAX_TOKENS:
+        summary_lines.pop(0)
+    return "\n".join(summary_lines)
+
+def _allocate(budget: int, demands: dict, weights: dict) -> dict:
+    """Splits budget across sections by weight; sections needing less than their share hand the rest to the others."""
+    allocation = {}
+    pending = {name: demand for name, demand in demands.items() if demand > 0}
+    while pending:
+        total_weight = sum(weights[name] for name in pending)
+        shares = {name: budget * weights[name] // total_weight for name in pending}
+        satisfied = {name: demand for name, demand in pending.items() if demand <= shares[name]}
+        if not satisfied:
+            allocation.update(shares)
+            break
+        for name, demand in satisfied.items():
+            allocation[name] = demand
+            budget -= demand
+            del pending[name]
+    return allocation
+
+def _format_history(summary: str, turns: list[tuple[str, str]], budget: int) -> str:
+    # The summary is guaranteed at most PROMPT_SUMMARY_SHARE of the budget; the rest goes to the
+    # most recent turns, kept verbatim newest first, and whatever they leave over goes back to the summary
+    summary_reserve = min(estimate_tokens(summary), int(budget * settings.PROMPT_SUMMARY_SHARE))
+    turns_budget = budget - summary_reserve
+    kept = []
+    used = 0
+    for role, content in reversed(turns):
+        line = f"{role}: {content}"
+        line_tokens = estimate_tokens(line)
+        if used + line_tokens > turns_budget:
+            if not kept:
+                kept.append(f"{role}: {truncate_to_tokens(content, turns_budget)}")
+                used = turns_budget
+            break
+        kept.append(line)
+        used += line_tokens
+    kept.reverse()
+
+    parts = []
+    if summary:
+        parts.append("Summary of earlier conversation:\n" + truncate_to_tokens(summary, budget - used))
+    if kept:
+        parts.append("\n".join(kept))
+    return "\n\n".join(parts) if parts else "No previous messages in this chat."
+
+def build_prompt(
+    query: str,
+    history_summary: str = "",
+    history_turns: list[tuple[str, str]] = None,
+    pdf_context: str = "",
+    web_context: str = "",
+    search_mode: bool = False
+) -> str:
+    """Assembles the prompt within PROMPT_MAX_TOKENS.
+
+    Instructions and the question are always included; the remaining budget is shared by
+    history, document context and web context according to their PROMPT_*_WEIGHT settings.
+    """
+    history_turns = history_turns or []
+    fixed = estimate_tokens(SYSTEM_INSTRUCTIONS) + estimate_tokens(query) + 40  # Section headings
+    budget = max(settings.PROMPT_MAX_TOKENS - fixed, 0)
+
+    demands = {
+        "history": estimate_tokens(history_summary) + sum(estimate_tokens(f"{role}: {content}") for role, content in history_turns),
+        "documents": estimate_tokens(pdf_context),
+        "web": estimate_tokens(web_context) if search_mode else 0,
+    }
+    weights = {
+        "history": settings.PROMPT_HISTORY_WEIGHT,
+        "documents": settings.PROMPT_DOCUMENTS_WEIGHT,
+        "web": settings.PROMPT_WEB_WEIGHT,
+    }
+    allocation = _allocate(budget, demands, weights)
+
+    sections = [SYSTEM_INSTRUCTIONS]
+    if search_mode:
+        sections.append("**Web Search Results:**\n" + truncate_to_tokens(web_context, allocation.get("web", 0)))
+    sections.append("**Document Context:**\n" + truncate_to_tokens(pdf_context, allocation.get("documents", 0)))
+    sections.append("**Chat History:**\n" + _format_history(history_summary, history_turns, allocation.get("history", 0)))
+    sections.append(f"**User Question:** {query}")
+    prompt = "\n\n".join(sections)
+
+    logger.info(f"Built prompt of ~{estimate_tokens(prompt)} tokens (demands: {demands}, allocation: {allocation})")
+    return prompt
@@ -0,0 +1,152 @@
+from abc import ABC, abstractmethod
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class QuotaDecision:
+    allowed: bool
+    used: int  # Hits in the window, including this one when allowed
+    limit: int
+    retry_after: float  # Seconds until the oldest hit leaves the window (0 when allowed)
+
+class QuotaBackend(ABC):
+    """Sliding-window log limiter: at most `limit` hits per key within any `window_seconds` span."""
+
+    def __init__(self, limit: int, window_seconds: float):
+        self.limit = limit
+        self.window_seconds = window_seconds
+
+    @abstractmethod
+    async def hit(self, key: str) -> QuotaDecision:
+        """Atomically records a hit for key if it is under the limit."""
+
+    async def close(self):
+        pass
+
+    def _decide(self, hits: list[float], now: float) -> QuotaDecision:
+        if len(hits) < self.limit:
+            return QuotaDecision(True, len(hits) + 1, self.limit, 0.0)
+        retry_after = max(hits[-self.limit] + self.window_seconds - now, 0.0)
+        return QuotaDecision(False, len(hits), self.limit, retry_after)
+
+class MemoryQuotaBackend(QuotaBackend):
+    """Per-process backend; keys expire with their last hit and the key count is capped (LRU)."""
+
+    def __init__(self, limit: int, window_seconds: float, max_keys: int):
+        super().__init__(limit, window_seconds)
+        self.max_keys = max_keys
+        self._hits: OrderedDict = OrderedDict()  # key -> deque of hit timestamps, oldest first
+        self.evictions = 0
+
+    async def hit(self, key: str) -> QuotaDecision:
+        # No awaits between read and write, so this is atomic on the event loop
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque(maxlen=self.limit)
+        self._hits.move_to_end(key)
+        while hits and hits[0] <= now - self.window_seconds:
+            hits.popleft()
+
+        decision = self._decide(list(hits), now)
+        if decision.allowed:
+            hits.append(now)
+        self._evict(now)
+        return decision
+
+    def _evict(self, now: float):
+        # Least recently seen keys sit at the front; drop them once expired or over the cap
+        while self._hits:
+            key, hits = next(iter(self._hits.items()))
+            expired = not hits or hits[-1] <= now - self.window_seconds
+            if not expired and len(self._hits) <= self.max_keys:
+                break
+            del self._hits[key]
+            self.evictions += int(not expired)
+
+    def __len__(self) -> int:
+        return len(self._hits)
+
+class SQLiteQuotaBackend(QuotaBackend):
+    """Shared backend for several workers on one host: hits live in a SQLite file.
+
+    BEGIN IMMEDIATE takes the database write lock before reading, so the count and the
+    insert form one transaction across processes.
+    """
+
+    PURGE_INTERVAL_SECONDS = 60
+
+    def __init__(self, limit: int, window_seconds: float, path: str):
+        super().__init__(limit, window_seconds)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS quota_hits (key TEXT NOT NULL, hit_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_quota_hits_key_hit_at ON quota_hits (key, hit_at)")
+        self._last_purge = 0.0
+
+    async def hit(self, key: str) -> QuotaDecision:
+        return await asyncio.to_thread(self._hit, key)
+
+    def _hit(self, key: str) -> QuotaDecision:
+        # Wall-clock time, since the timestamps are compared across processes
+        now = time.time()
+        window_start = now - self.window_seconds
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if now - self._last_purge > self.PURGE_INTERVAL_SECONDS:
+                    self._conn.execute("DELETE FROM quota_hits WHERE hit_at <= ?", (window_start,))
+                    self._last_purge = now
+                hits = [row[0] for row in self._conn.execute(
+                    "SELECT hit_at FROM quota_hits WHERE key = ? AND hit_at > ? ORDER BY hit_at",
+                    (key, window_start)
+                )]
+                decision = self._decide(hits, now)
+                if decision.allowed:
+                    self._conn.execute("INSERT INTO quota_hits (key, hit_at) VALUES (?, ?)", (key, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return decision
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+_backend: QuotaBackend = None
+
+def get_anonymous_quota() -> QuotaBackend:
+    """Returns the anonymous message quota backend selected by QUOTA_BACKEND."""
+    global _backend
+    if _backend is None:
+        limit = settings.ANONYMOUS_MESSAGE_LIMIT
+        window = settings.ANONYMOUS_QUOTA_WINDOW_SECONDS
+        if settings.QUOTA_BACKEND == "sqlite":
+            _backend = SQLiteQuotaBackend(limit, window, settings.QUOTA_SQLITE_PATH)
+        elif settings.QUOTA_BACKEND == "memory":
+            _backend = MemoryQuotaBackend(limit, window, settings.QUOTA_MAX_KEYS)
+        else:
+            raise ValueError(f"Unknown QUOTA_BACKEND: {settings.QUOTA_BACKEND}")
+        logger.info(f"Anonymous quota: {limit} messages per {window:.0f}s ({settings.QUOTA_BACKEND} backend)")
+    return _backend
+
+async def close_quota_backend():
+    """Releases the quota backend (called on application shutdown)."""
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
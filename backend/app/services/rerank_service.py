@@ -0,0 +1,40 @@
+import numpy as np
+
+def as_matrix(vectors: list) -> np.ndarray:
+    """Stacks embeddings (pgvector Vector, ndarray or list) into an L2-normalized float32 matrix."""
+    matrix = np.stack([
+        np.asarray(vector.to_numpy() if hasattr(vector, "to_numpy") else vector, dtype=np.float32)
+        for vector in vectors
+    ])
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def mmr_select(query_vector, candidate_vectors, top_n: int, lambda_: float, relevance=None) -> list[int]:
+    """Maximal marginal relevance: greedily picks candidates that are relevant but unlike those already picked.
+
+    Each step scores lambda * relevance - (1 - lambda) * (max similarity to the selection) for all
+    candidates at once, with one matrix-vector product per pick to update the similarities.
+    relevance defaults to cosine similarity with the query. Returns candidate indices in pick order.
+    """
+    candidates = as_matrix(candidate_vectors)
+    count = len(candidates)
+    top_n = min(top_n, count)
+    if relevance is None:
+        relevance = candidates @ as_matrix([query_vector])[0]
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+
+    selected = []
+    max_similarity = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    for _ in range(top_n):
+        if selected:
+            scores = lambda_ * relevance - (1 - lambda_) * max_similarity
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, candidates @ candidates[best], out=max_similarity)
+    return selected
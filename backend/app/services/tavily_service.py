@@ -1,17 +1,82 @@
-from tavily import TavilyClient
-from fastapi import HTTPException
+import httpx
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.services.embedding_cache import normalize_text
 import logging
 
 logger = logging.getLogger(__name__)
 
-def fetch_tavily_data(query: str) -> str:
-    """Fetch extra topical information from Tavilly."""
+_client: httpx.AsyncClient = None
+_results = TTLCache(
+    max_entries=settings.TAVILY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TAVILY_CACHE_TTL_SECONDS
+)
+
+def _get_client() -> httpx.AsyncClient:
+    """Returns the shared Tavily HTTP client, creating its connection pool on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {settings.TAVILY_API_KEY}"
+            },
+            timeout=httpx.Timeout(settings.TAVILY_TIMEOUT_SECONDS)
+        )
+    return _client
+
+async def close_tavily_client():
+    """Closes the shared Tavily HTTP client (called on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _trim(text: str, max_chars: int) -> str:
+    text = " ".join((text or "").split())
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip() + "…"
+
+def compact_results(response: dict) -> dict:
+    """Keeps only the fields the prompt and the sources UI use, with each result's content trimmed."""
+    return {
+        "query": response.get("query"),
+        "results": [
+            {
+                "title": result.get("title"),
+                "url": result.get("url"),
+                "content": _trim(result.get("content"), settings.TAVILY_RESULT_MAX_CHARS),
+                "score": round(result["score"], 3) if isinstance(result.get("score"), (int, float)) else None
+            }
+            for result in response.get("results", [])[:settings.TAVILY_MAX_RESULTS]
+        ]
+    }
+
+async def fetch_tavily_data(query: str) -> dict:
+    """Fetch extra topical information from Tavilly, compacted and cached per normalized query."""
+    cache_key = normalize_text(query).casefold()
+    cached = _results.get(cache_key)
+    if cached is not None:
+        return cached
+
+    payload = {
+        "query": query,
+        "max_results": settings.TAVILY_MAX_RESULTS,
+        "include_images": False
+    }
     try:
-        client = TavilyClient(api_key=settings.TAVILY_API_KEY)
-        response = client.search(query=query, include_images=False)
-        print(response)
-        return response
-    except Exception as e:
+        response = await _get_client().post(settings.TAVILY_API_URL, json=payload)
+        response.raise_for_status()
+        results = compact_results(response.json())
+    except (httpx.HTTPError, ValueError) as e:
         logger.error(f"Error fetching Tavily data: {e}", exc_info=True)
-        return ""
\ No newline at end of file
+        return {}
+
+    logger.info(f"Tavily returned {len(results['results'])} results for query ({len(query)} chars)")
+    _results.set(cache_key, results)
+    return results
+
+def tavily_cache_stats() -> dict:
+    return _results.stats()
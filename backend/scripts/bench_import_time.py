@@ -0,0 +1,60 @@
+"""Import-time benchmark: fails if importing app.main gets slow or pulls in heavy provider SDKs.
+
+    python scripts/bench_import_time.py --runs 5 --max-ms 1200
+
+Run from the backend directory. Each run imports app.main in a fresh interpreter, so nothing is
+cached in sys.modules; no database or API keys are needed, as nothing connects at import time.
+Exits with status 1 if the median import time exceeds --max-ms or if any of the lazily imported
+provider modules is loaded by the import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use only; loading any of these at startup is a regression
+LAZY_MODULES = ["google.generativeai", "jose", "PyPDF2", "numpy"]
+
+CHILD = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed_ms, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def measure() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_DB_PORT", "5432")  # The engine URL needs a port; nothing connects
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main(runs: int, max_ms: float) -> int:
+    samples = [measure() for _ in range(runs)]
+    timings_ms = sorted(sample["ms"] for sample in samples)
+    loaded = sorted({module for sample in samples for module in sample["loaded"]})
+    median_ms = statistics.median(timings_ms)
+    print(f"import app.main runs={runs}  min={timings_ms[0]:.0f}ms  p50={median_ms:.0f}ms  max={timings_ms[-1]:.0f}ms  budget={max_ms:.0f}ms")
+
+    failed = False
+    if median_ms > max_ms:
+        print(f"FAIL median import time {median_ms:.0f}ms exceeds the {max_ms:.0f}ms budget")
+        failed = True
+    if loaded:
+        print(f"FAIL imported at startup instead of on first use: {', '.join(loaded)}")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=1200)
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.max_ms))
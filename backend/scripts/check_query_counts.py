@@ -0,0 +1,130 @@
+"""Query-count check: asserts how many SQL statements each chat/PDF endpoint issues.
+
+Runs the API in-process against the primary database configured through the usual
+SUPABASE_DB_* variables (point them at a disposable database), seeding a user, a chat
+session with messages and a PDF, and removing them again afterwards. Authentication is
+replaced by a fixed user, so no Clerk token is needed, and the Gemini call of /chat/stream is
+replaced by a canned answer, so no API key is needed either.
+
+    python scripts/check_query_counts.py
+
+Run from the backend directory. Exits with status 1 if any endpoint issues more statements
+than its budget, printing the statements it ran.
+"""
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+import httpx
+from sqlalchemy import delete, insert, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api import auth
+from app.core.database import AsyncSessionLocal, engine
+from app.core.query_counter import count_queries
+from app.main import app
+from app.migrations import run_migrations
+from app.migrations.primary import PRIMARY_MIGRATIONS
+from app.models import db_models
+from app.services import gemini_service
+from app.services.auth_service import AuthenticatedUser
+
+SEED_MESSAGES = 30
+
+async def seed() -> dict:
+    await run_migrations(engine, PRIMARY_MIGRATIONS, "primary")
+
+    async with AsyncSessionLocal() as db:
+        user_id = (await db.execute(
+            insert(db_models.User)
+            .values(clerk_user_id=f"query-count-{uuid.uuid4()}", username="query-count")
+            .returning(db_models.User.id)
+        )).scalar_one()
+        session_id = (await db.execute(
+            insert(db_models.ChatSession)
+            .values(user_id=user_id, name="Query count", message_count=SEED_MESSAGES)
+            .returning(db_models.ChatSession.id)
+        )).scalar_one()
+        await db.execute(insert(db_models.ChatMessage), [
+            {"session_id": session_id, "user_id": user_id, "content": f"message {i}", "is_user_message": i % 2 == 0}
+            for i in range(SEED_MESSAGES)
+        ])
+        pdf_id = (await db.execute(
+            insert(db_models.PDFDocument)
+            .values(user_id=user_id, filename="query-count.pdf", file_size=1, status="ready")
+            .returning(db_models.PDFDocument.id)
+        )).scalar_one()
+        await db.commit()
+    return {"user_id": user_id, "session_id": session_id, "pdf_id": pdf_id}
+
+async def cleanup(ids: dict):
+    async with AsyncSessionLocal() as db:
+        session_ids = select(db_models.ChatSession.id).where(db_models.ChatSession.user_id == ids["user_id"])
+        await db.execute(delete(db_models.ChatMessage).where(db_models.ChatMessage.session_id.in_(session_ids)))
+        await db.execute(delete(db_models.ChatSessionPDF).where(db_models.ChatSessionPDF.chat_session_id.in_(session_ids)))
+        await db.execute(delete(db_models.ChatSession).where(db_models.ChatSession.user_id == ids["user_id"]))
+        await db.execute(delete(db_models.PDFDocument).where(db_models.PDFDocument.user_id == ids["user_id"]))
+        await db.execute(delete(db_models.User).where(db_models.User.id == ids["user_id"]))
+        await db.commit()
+
+async def canned_answer(prompt: str):
+    for text in ("A canned ", "answer."):
+        yield f"data: {json.dumps({'text': text})}\n\n"
+
+async def main() -> int:
+    ids = await seed()
+    user = AuthenticatedUser(id=ids["user_id"], clerk_user_id="query-count", email=None, username="query-count")
+    app.dependency_overrides[auth.get_current_user] = lambda: user
+    app.dependency_overrides[auth.get_optional_current_user] = lambda: user
+    gemini_service.generate_response_with_gemini_streaming = canned_answer
+    session_id, pdf_id = ids["session_id"], ids["pdf_id"]
+
+    # (method, path, statement budget); order matters, the final checks delete what earlier ones read
+    checks = [
+        ("GET", "/chat/sessions", 1),
+        ("GET", f"/chat/sessions/{session_id}", 2),
+        ("GET", f"/chat/sessions/{session_id}?limit=10", 2),
+        ("POST", "/chat/sessions", 1),
+        ("PUT", f"/chat/sessions/{session_id}", 1),
+        # Session and PDF lookups, cold history load (session row, messages, summary fold), then
+        # one INSERT per message (different column sets), the counter update and the summary fold
+        ("POST", "/chat/stream", 9),
+        ("POST", "/chat/stream", 6),  # History now buffered and validated by the session lookup: no history queries
+        ("GET", "/pdf/list", 1),
+        ("POST", f"/pdf/sessions/{session_id}/add_pdf/{pdf_id}", 3),
+        ("POST", f"/pdf/sessions/{session_id}/add_pdf/{pdf_id}", 3),  # Already added: same statements
+        ("GET", f"/pdf/sessions/{session_id}/pdfs", 2),
+        ("DELETE", f"/pdf/sessions/{session_id}/remove_pdf/{pdf_id}", 2),
+        ("DELETE", f"/chat/sessions/{session_id}", 3),
+    ]
+    bodies = {
+        ("POST", "/chat/sessions"): {"name": "Query count 2"},
+        ("PUT", f"/chat/sessions/{session_id}"): {"name": "Renamed"},
+        ("POST", "/chat/stream"): {"query": "What did we talk about?", "isSearchMode": False, "session_id": session_id},
+    }
+
+    failures = 0
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for method, path, budget in checks:
+                body = bodies.get((method, path))
+                with count_queries(engine) as counter:
+                    response = await client.request(method, path, json=body)
+                ok = response.status_code < 400 and counter.count <= budget
+                failures += not ok
+                print(f"{'ok  ' if ok else 'FAIL'} {method:<6} {path:<45} status={response.status_code} queries={counter.count} budget={budget}")
+                if not ok:
+                    for statement in counter.statements:
+                        print(f"       {' '.join(statement.split())[:160]}")
+    finally:
+        app.dependency_overrides.clear()
+        await cleanup(ids)
+        await engine.dispose()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,91 @@
+"""Load test for connection pool settings: throughput, latency and acquire wait per pool size.
+
+    python scripts/load_test_pool.py --concurrency 40 --query-ms 20 --pools 5:0 5:10 20:10 40:0
+
+Run from the backend directory against the primary database configured through the usual
+SUPABASE_DB_* variables. Each pool configuration ("size:overflow") gets a fresh engine; the other
+pool settings (timeout, recycle, pre-ping, statement cache) come from Settings. Every worker
+repeatedly checks out a connection and runs SELECT pg_sleep(query-ms) for --duration seconds,
+standing in for a request's queries. When the pool is smaller than the concurrency, requests
+queue for a connection: the acquire wait grows while the query time stays the same.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_DB_PORT", "5432")  # Postgres' default; the engine URL needs a port
+
+from app.core.config import settings
+from app.core.database import DATABASE_URL, create_pooled_engine
+
+async def run(pool_size: int, max_overflow: int, concurrency: int, query_ms: float, duration: float) -> dict:
+    engine = create_pooled_engine(
+        DATABASE_URL,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pre_ping=settings.DB_POOL_PRE_PING,
+        statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE
+    )
+    latencies_ms = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": query_ms / 1000})
+            except Exception:
+                errors += 1
+                continue
+            latencies_ms.append((time.perf_counter() - started) * 1000)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stats = engine.pool.stats()
+    finally:
+        await engine.dispose()
+
+    latencies_ms.sort()
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "rps": len(latencies_ms) / elapsed,
+        "p50": statistics.median(latencies_ms) if latencies_ms else 0.0,
+        "p95": latencies_ms[int(len(latencies_ms) * 0.95) - 1] if latencies_ms else 0.0,
+        "pool": stats,
+    }
+
+async def main(pools: list[str], concurrency: int, query_ms: float, duration: float):
+    print(f"concurrency={concurrency} query={query_ms:.0f}ms duration={duration:g}s")
+    for pool in pools:
+        pool_size, max_overflow = (int(part) for part in pool.split(":"))
+        result = await run(pool_size, max_overflow, concurrency, query_ms, duration)
+        stats = result["pool"]
+        print(
+            f"pool={pool_size}+{max_overflow:<3} rps={result['rps']:7.1f}  p50={result['p50']:7.1f}ms  "
+            f"p95={result['p95']:7.1f}ms  wait p50={stats['wait_ms_p50']:.1f}ms p95={stats['wait_ms_p95']:.1f}ms  "
+            f"peak_checked_out={stats['peak_checked_out']} peak_overflow={stats['peak_overflow']}  "
+            f"timeouts={stats['timeouts']} errors={result['errors']}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pools", nargs="+", default=["5:0", "5:10", "20:10"], help="size:overflow pairs")
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--query-ms", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.pools, args.concurrency, args.query_ms, args.duration))
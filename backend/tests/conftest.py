@@ -0,0 +1,5 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_DB_PORT", "5432")  # Importing app.services builds the engine URL; nothing connects
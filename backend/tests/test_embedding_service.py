@@ -0,0 +1,107 @@
+"""Embedding batching against a fake Jina endpoint (httpx.MockTransport, no network)."""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services import embedding_service
+
+class FakeJina:
+    """Answers embedding requests with [len(text)] vectors, in reverse order to exercise the index sort."""
+
+    def __init__(self, delay: float = 0.0, status_code: int = 200):
+        self.delay = delay
+        self.status_code = status_code
+        self.requests: list[list[str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        inputs = json.loads(request.content)["input"]
+        self.requests.append(inputs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, json={"detail": "upstream error"})
+        data = [{"index": i, "embedding": [float(len(text))]} for i, text in enumerate(inputs)]
+        return httpx.Response(200, json={"data": data[::-1]})
+
+@pytest.fixture
+def fake_jina(monkeypatch):
+    fake = FakeJina()
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "EMBEDDING_MAX_CONCURRENT_BATCHES", 2)
+    monkeypatch.setattr(settings, "EMBEDDING_MICROBATCH_WINDOW_MS", 20)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(embedding_service, "_client", httpx.AsyncClient(transport=httpx.MockTransport(fake.handle)))
+    monkeypatch.setattr(embedding_service, "_batcher", None)
+    monkeypatch.setattr(embedding_service, "_batch_slots", None)
+    return fake
+
+def test_get_embeddings_sends_provider_sized_batches(fake_jina):
+    fake_jina.delay = 0.01
+    texts = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff", "g"]
+
+    embeddings = asyncio.run(embedding_service.get_embeddings(texts))
+
+    assert embeddings == [[float(len(text))] for text in texts]
+    assert sorted(len(batch) for batch in fake_jina.requests) == [1, 3, 3]
+    assert fake_jina.max_in_flight <= 2
+
+def test_concurrent_queries_share_one_deduplicated_request(fake_jina):
+    async def main():
+        return await asyncio.gather(*(embedding_service.get_embedding(text) for text in ["a", "bb", "a", "ccc"]))
+
+    assert asyncio.run(main()) == [[1.0], [2.0], [1.0], [3.0]]
+    assert fake_jina.requests == [["a", "bb", "ccc"]]
+
+def test_micro_batch_never_exceeds_batch_size(fake_jina):
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    async def main():
+        return await asyncio.gather(*(embedding_service.get_embedding(text) for text in texts))
+
+    assert asyncio.run(main()) == [[float(len(text))] for text in texts]
+    assert [len(batch) for batch in fake_jina.requests] == [3, 2]
+
+def test_cancelled_caller_is_dropped_from_the_batch(fake_jina):
+    async def main():
+        dropped = asyncio.create_task(embedding_service.get_embedding("dropped"))
+        kept = asyncio.create_task(embedding_service.get_embedding("kept"))
+        await asyncio.sleep(0)
+        dropped.cancel()
+        return await kept
+
+    assert asyncio.run(main()) == [4.0]
+    assert fake_jina.requests == [["kept"]]
+
+def test_upstream_error_fails_every_waiter(fake_jina):
+    fake_jina.status_code = 500
+
+    async def main():
+        return await asyncio.gather(
+            *(embedding_service.get_embedding(text) for text in ["a", "bb"]), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, HTTPException) and result.status_code == 500 for result in results)
+    assert fake_jina.requests == [["a", "bb"]]
+
+def test_close_sends_pending_texts(fake_jina, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_MICROBATCH_WINDOW_MS", 10_000)
+
+    async def main():
+        waiter = asyncio.create_task(embedding_service.get_embedding("late"))
+        await asyncio.sleep(0)
+        await embedding_service.close_embedding_client()
+        return await waiter
+
+    assert asyncio.run(main()) == [4.0]
+    assert fake_jina.requests == [["late"]]
@@ -0,0 +1,103 @@
+"""Gemini streaming bridge against a fake model whose stream blocks like the SDK's network reads."""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import gemini_service
+
+class FakeChunk:
+    def __init__(self, text: str = None):
+        self._text = text
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            raise ValueError("chunk has no text parts")
+        return self._text
+
+class FakeModel:
+    """Yields chunks from a blocking iterator, optionally failing after fail_after chunks."""
+
+    def __init__(self, chunks: list, delay: float = 0.0, fail_after: int = None):
+        self.chunks = chunks
+        self.delay = delay
+        self.fail_after = fail_after
+        self.pulled = 0
+        self.finished = threading.Event()
+
+    def generate_content(self, prompt, stream, generation_config):
+        assert stream is True
+
+        def iterate():
+            try:
+                for chunk in self.chunks:
+                    if self.fail_after is not None and self.pulled == self.fail_after:
+                        raise RuntimeError("upstream reset")
+                    time.sleep(self.delay)
+                    self.pulled += 1
+                    yield chunk
+            finally:
+                self.finished.set()
+        return iterate()
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    def install(model: FakeModel) -> FakeModel:
+        monkeypatch.setattr(gemini_service, "_model", model)
+        return model
+    return install
+
+def texts(frames: list[str]) -> list[str]:
+    return [json.loads(frame.removeprefix("data: "))["text"] for frame in frames]
+
+async def collect(limit: int = None) -> list[str]:
+    frames = []
+    stream = gemini_service.generate_response_with_gemini_streaming("prompt")
+    try:
+        async for frame in stream:
+            frames.append(frame)
+            if limit is not None and len(frames) == limit:
+                break
+    finally:
+        await stream.aclose()
+    return frames
+
+def test_stream_completes_in_order(fake_model):
+    fake_model(FakeModel([FakeChunk("Hello"), FakeChunk(None), FakeChunk(", "), FakeChunk("world")], delay=0.01))
+
+    frames = asyncio.run(collect())
+
+    assert texts(frames) == ["Hello", ", ", "world"]
+    assert all(frame.startswith("data: ") and frame.endswith("\n\n") for frame in frames)
+
+def test_upstream_error_mid_stream_reaches_the_consumer(fake_model):
+    fake_model(FakeModel([FakeChunk("one"), FakeChunk("two"), FakeChunk("three")], fail_after=2))
+    frames = []
+
+    async def main():
+        async for frame in gemini_service.generate_response_with_gemini_streaming("prompt"):
+            frames.append(frame)
+
+    with pytest.raises(RuntimeError, match="upstream reset"):
+        asyncio.run(main())
+    assert texts(frames) == ["one", "two"]
+
+def test_disconnect_stops_the_producer_thread(fake_model, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_STREAM_QUEUE_SIZE", 2)
+    model = fake_model(FakeModel([FakeChunk(f"chunk {i}") for i in range(1000)]))
+
+    async def main():
+        frames = await collect(limit=1)
+        # The producer is blocked on the full queue; it must notice the consumer left and stop
+        await asyncio.to_thread(model.finished.wait, 5)
+        return frames
+
+    frames = asyncio.run(main())
+
+    assert texts(frames) == ["chunk 0"]
+    assert model.finished.is_set()
+    assert model.pulled < 10  # Backpressure: it never read ahead of the bounded queue
@@ -22,6 +22,8 @@ export function Layout({
     deleteSession,
     renameSession,
     switchSession,
+    hasMoreSessions,
+    loadMoreSessions,
   } = useChat();
 
   useEffect(() => {
@@ -46,6 +48,8 @@ export function Layout({
           onDeleteSession={deleteSession}
           onRenameSession={renameSession}
           currentSessionId={sessionId}
+          hasMoreSessions={hasMoreSessions}
+          onLoadMoreSessions={loadMoreSessions}
         />
       )}
       <main className="relative flex h-full w-full flex-1 flex-col">
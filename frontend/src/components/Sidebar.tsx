@@ -29,6 +29,8 @@ interface SidebarProps {
   onDeleteSession: (id: number) => void;
   onRenameSession: (id: number, name: string) => void;
   currentSessionId?: number;
+  hasMoreSessions?: boolean;
+  onLoadMoreSessions?: () => void;
 }
 
 export function Sidebar({
@@ -37,6 +39,8 @@ export function Sidebar({
   onDeleteSession,
   onRenameSession,
   currentSessionId,
+  hasMoreSessions,
+  onLoadMoreSessions,
 }: SidebarProps) {
   const [isOpen, setIsOpen] = useState(false);
   const [editingSession, setEditingSession] = useState<number | null>(null);
@@ -80,6 +84,8 @@ export function Sidebar({
                 startEditing={startEditing}
                 handleRename={handleRename}
                 currentSessionId={currentSessionId}
+                hasMoreSessions={hasMoreSessions}
+                onLoadMoreSessions={onLoadMoreSessions}
                 setIsOpen={setIsOpen}
                 isAuthenticated={isAuthenticated}
                 signOut={signOut}
@@ -103,6 +109,8 @@ export function Sidebar({
           startEditing={startEditing}
           handleRename={handleRename}
           currentSessionId={currentSessionId}
+          hasMoreSessions={hasMoreSessions}
+          onLoadMoreSessions={onLoadMoreSessions}
           isAuthenticated={isAuthenticated}
           signOut={signOut}
           mobile={false}
@@ -123,6 +131,8 @@ interface SidebarContentProps {
   startEditing: (session: ChatSession) => void;
   handleRename: (id: number) => void;
   currentSessionId?: number;
+  hasMoreSessions?: boolean;
+  onLoadMoreSessions?: () => void;
   setIsOpen?: (open: boolean) => void;
   isAuthenticated: boolean;
   signOut: () => void;
@@ -140,6 +150,8 @@ function SidebarContent({
   startEditing,
   handleRename,
   currentSessionId,
+  hasMoreSessions,
+  onLoadMoreSessions,
   setIsOpen,
   isAuthenticated,
   signOut,
@@ -189,102 +201,113 @@ function SidebarContent({
       <div className="space-y-1">
         {isAuthenticated ? (
           sessions.length > 0 ? (
-            sessions.map((session) => (
-              <div key={session.id} className="relative group">
-                {editingSession === session.id ? (
-                  <div className="flex items-center space-x-1 p-1">
-                    <Input
-                      value={newName}
-                      onChange={(e) => setNewName(e.target.value)}
-                      onKeyDown={(e) => {
-                        if (e.key === "Enter") handleRename(session.id);
-                        if (e.key === "Escape") setEditingSession(null);
-                      }}
-                      autoFocus
-                      className="h-8"
-                    />
-                    <Button
-                      size="sm"
-                      className="ml-2"
-                      variant="default"
-                      onClick={() => handleRename(session.id)}
-                    >
-                      Save
-                    </Button>
-                  </div>
-                ) : (
-                  <Link
-                    to="/chat/$sessionId"
-                    params={{ sessionId: session.id.toString() }}
-                    className={`flex items-center space-x-2 rounded-md px-3 my-2 py-2 text-sm hover:bg-neutral-700 hover:cursor-pointer
-                      ${
-                        currentSessionId === session.id
-                          ? "bg-[#191a1a] text-accent-foreground"
-                          : "hover:bg-accent/50"
-                      }`}
-                    onClick={() => {
-                      if (setIsOpen) setIsOpen(false);
-                    }}
-                  >
-                    <MessageSquare className="h-4 w-4" />
-                    <span className="flex-1 truncate">{session.name}</span>
-                    <div
-                      className={`flex space-x-1 ${
-                        mobile
-                          ? ""
-                          : "opacity-0 group-hover:opacity-100 transition-opacity"
-                      }`}
-                    >
-                      <Button
-                        variant="ghost"
-                        size="icon"
-                        className="h-6 w-6 hover:text-green-700 hover:cursor-pointer"
-                        onClick={(e) => {
-                          e.preventDefault();
-                          e.stopPropagation();
-                          startEditing(session);
+            <>
+              {sessions.map((session) => (
+                <div key={session.id} className="relative group">
+                  {editingSession === session.id ? (
+                    <div className="flex items-center space-x-1 p-1">
+                      <Input
+                        value={newName}
+                        onChange={(e) => setNewName(e.target.value)}
+                        onKeyDown={(e) => {
+                          if (e.key === "Enter") handleRename(session.id);
+                          if (e.key === "Escape") setEditingSession(null);
                         }}
-                      >
-                        <Edit2 className="h-3 w-3" />
-                      </Button>
+                        autoFocus
+                        className="h-8"
+                      />
                       <Button
-                        variant="ghost"
-                        size="icon"
-                        className="h-6 w-6 hover:text-red-700 hover:cursor-pointer"
-                        onClick={(e) => handleDeleteClick(e, session.id)}
+                        size="sm"
+                        className="ml-2"
+                        variant="default"
+                        onClick={() => handleRename(session.id)}
                       >
-                        <Trash2 className="h-3 w-3" />
+                        Save
                       </Button>
                     </div>
-                    <Dialog
-                      open={deleteDialogOpen}
-                      onOpenChange={setDeleteDialogOpen}
+                  ) : (
+                    <Link
+                      to="/chat/$sessionId"
+                      params={{ sessionId: session.id.toString() }}
+                      className={`flex items-center space-x-2 rounded-md px-3 my-2 py-2 text-sm hover:bg-neutral-700 hover:cursor-pointer
+                        ${
+                          currentSessionId === session.id
+                            ? "bg-[#191a1a] text-accent-foreground"
+                            : "hover:bg-accent/50"
+                        }`}
+                      onClick={() => {
+                        if (setIsOpen) setIsOpen(false);
+                      }}
                     >
-                      <DialogContent className="bg-[#202222] text-slate-100 border-slate-900">
-                        <DialogHeader>
-                          <DialogTitle>Delete {session.name}</DialogTitle>
-                          <DialogDescription>
-                            Are you sure you want to delete this chat? This
-                            action cannot be undone.
-                          </DialogDescription>
-                        </DialogHeader>
-                        <DialogFooter>
-                          <Button
-                            variant="outline"
-                            onClick={() => setDeleteDialogOpen(false)}
-                          >
-                            Cancel
-                          </Button>
-                          <Button variant="destructive" onClick={confirmDelete}>
-                            Delete
-                          </Button>
-                        </DialogFooter>
-                      </DialogContent>
-                    </Dialog>
-                  </Link>
-                )}
-              </div>
-            ))
+                      <MessageSquare className="h-4 w-4" />
+                      <span className="flex-1 truncate">{session.name}</span>
+                      <div
+                        className={`flex space-x-1 ${
+                          mobile
+                            ? ""
+                            : "opacity-0 group-hover:opacity-100 transition-opacity"
+                        }`}
+                      >
+                        <Button
+                          variant="ghost"
+                          size="icon"
+                          className="h-6 w-6 hover:text-green-700 hover:cursor-pointer"
+                          onClick={(e) => {
+                            e.preventDefault();
+                            e.stopPropagation();
+                            startEditing(session);
+                          }}
+                        >
+                          <Edit2 className="h-3 w-3" />
+                        </Button>
+                        <Button
+                          variant="ghost"
+                          size="icon"
+                          className="h-6 w-6 hover:text-red-700 hover:cursor-pointer"
+                          onClick={(e) => handleDeleteClick(e, session.id)}
+                        >
+                          <Trash2 className="h-3 w-3" />
+                        </Button>
+                      </div>
+                      <Dialog
+                        open={deleteDialogOpen}
+                        onOpenChange={setDeleteDialogOpen}
+                      >
+                        <DialogContent className="bg-[#202222] text-slate-100 border-slate-900">
+                          <DialogHeader>
+                            <DialogTitle>Delete {session.name}</DialogTitle>
+                            <DialogDescription>
+                              Are you sure you want to delete this chat? This
+                              action cannot be undone.
+                            </DialogDescription>
+                          </DialogHeader>
+                          <DialogFooter>
+                            <Button
+                              variant="outline"
+                              onClick={() => setDeleteDialogOpen(false)}
+                            >
+                              Cancel
+                            </Button>
+                            <Button variant="destructive" onClick={confirmDelete}>
+                              Delete
+                            </Button>
+                          </DialogFooter>
+                        </DialogContent>
+                      </Dialog>
+                    </Link>
+                  )}
+                </div>
+              ))}
+              {hasMoreSessions && onLoadMoreSessions && (
+                <Button
+                  variant="ghost"
+                  className="w-full text-sm text-muted-foreground hover:bg-neutral-700 hover:cursor-pointer"
+                  onClick={() => onLoadMoreSessions()}
+                >
+                  Load more
+                </Button>
+              )}
+            </>
           ) : (
             <p className="px-3 py-2 text-sm text-muted-foreground">
               No conversations yet. Start a new chat!
@@ -11,6 +11,8 @@ interface ChatWindowProps {
   sessionId?: number;
   isSearchMode: boolean;
   toggleSearchMode: () => void;
+  hasOlderMessages?: boolean;
+  onLoadOlderMessages?: () => void;
 }
 
 export function ChatWindow({
@@ -20,13 +22,16 @@ export function ChatWindow({
   sessionId,
   isSearchMode,
   toggleSearchMode,
+  hasOlderMessages,
+  onLoadOlderMessages,
 }: ChatWindowProps) {
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const lastMessage = messages[messages.length - 1];
 
-  // Scroll to bottom when messages change
+  // Scroll to bottom when the latest message changes (not when older ones are prepended)
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
-  }, [messages]);
+  }, [lastMessage?.id, lastMessage?.content]);
 
   return (
     <div className="flex h-full w-full flex-col items-center">
@@ -48,6 +53,16 @@ export function ChatWindow({
               </h2>
             </div>
             <div className="w-full mb-24 mt-12 lg:mt-4">
+              {hasOlderMessages && onLoadOlderMessages && (
+                <div className="flex justify-center py-2">
+                  <button
+                    className="text-sm text-muted-foreground hover:underline hover:cursor-pointer"
+                    onClick={() => onLoadOlderMessages()}
+                  >
+                    Load earlier messages
+                  </button>
+                </div>
+              )}
               {messages.map((message) => (
                 <ChatMessageComponent key={message.id} message={message} />
               ))}
@@ -19,6 +19,10 @@ interface ChatContextType {
   renameSession: (id: number, name: string) => Promise<void>;
   fetchSessions: () => Promise<void>;
   fetchSession: (id: number) => Promise<void>;
+  hasMoreSessions: boolean;
+  loadMoreSessions: () => Promise<void>;
+  hasOlderMessages: boolean;
+  loadOlderMessages: () => Promise<void>;
   toggleSearchMode: () => void;
 }
 
@@ -10,6 +10,11 @@ export function useChat(initialSessionId?: number) {
   );
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [sessions, setSessions] = useState<ChatSession[]>([]);
+  // Keyset cursors for the next page of sessions and for older messages; null when there are no more
+  const [sessionsCursor, setSessionsCursor] = useState<string | null>(null);
+  const [olderMessagesCursor, setOlderMessagesCursor] = useState<
+    string | null
+  >(null);
   const [isLoading, setIsLoading] = useState(false);
   const [isSearchMode, setIsSearchMode] = useState(false);
   const [messageCount, setMessageCount] = useState(0);
@@ -50,6 +55,7 @@ export function useChat(initialSessionId?: number) {
     if (!id) {
       // Reset state for new chat
       setMessages([]);
+      setOlderMessagesCursor(null);
     }
   }, []);
 
@@ -58,13 +64,35 @@ export function useChat(initialSessionId?: number) {
     if (!isAuthenticated) return;
 
     try {
-      const { data } = await chatApi.getChatSessions();
+      const { data, headers } = await chatApi.getChatSessions();
       setSessions(data);
+      setSessionsCursor(headers["x-next-cursor"] ?? null);
     } catch (error) {
       console.error("Failed to fetch chat sessions:", error);
     }
   }, [isAuthenticated]);
 
+  // Function to append the next page of chat sessions
+  const loadMoreSessions = useCallback(async () => {
+    if (!isAuthenticated || !sessionsCursor) return;
+
+    try {
+      const { data, headers } = await chatApi.getChatSessions({
+        cursor: sessionsCursor,
+      });
+      setSessions((prev) => {
+        const known = new Set(prev.map((session) => session.id));
+        return [
+          ...prev,
+          ...data.filter((session: ChatSession) => !known.has(session.id)),
+        ];
+      });
+      setSessionsCursor(headers["x-next-cursor"] ?? null);
+    } catch (error) {
+      console.error("Failed to fetch more chat sessions:", error);
+    }
+  }, [isAuthenticated, sessionsCursor]);
+
   // Function to fetch a specific chat session's messages
   const fetchSession = useCallback(
     async (id: number) => {
@@ -74,6 +102,7 @@ export function useChat(initialSessionId?: number) {
         setIsLoading(true);
         const { data } = await chatApi.getChatSession(id);
         setMessages(data.messages || []);
+        setOlderMessagesCursor(data.has_more ? data.next_cursor : null);
 
         // Update the session in our sessions list if needed
         setSessions((prev) => {
@@ -85,7 +114,7 @@ export function useChat(initialSessionId?: number) {
                 id: data.id,
                 name: data.name,
                 created_at: data.created_at,
-                message_count: data.messages?.length || 0,
+                message_count: data.message_count ?? data.messages?.length ?? 0,
               },
             ];
           }
@@ -104,6 +133,7 @@ export function useChat(initialSessionId?: number) {
             // Try the request again
             const { data } = await chatApi.getChatSession(id);
             setMessages(data.messages || []);
+            setOlderMessagesCursor(data.has_more ? data.next_cursor : null);
           } catch (refreshError) {
             // If refresh fails too, navigate to login
             handleNavigation("/login");
@@ -116,12 +146,28 @@ export function useChat(initialSessionId?: number) {
     [isAuthenticated, handleNavigation]
   );
 
+  // Function to prepend the page of messages before the oldest one loaded
+  const loadOlderMessages = useCallback(async () => {
+    if (!isAuthenticated || !sessionId || !olderMessagesCursor) return;
+
+    try {
+      const { data } = await chatApi.getChatSession(sessionId, {
+        before: olderMessagesCursor,
+      });
+      setMessages((prev) => [...(data.messages || []), ...prev]);
+      setOlderMessagesCursor(data.has_more ? data.next_cursor : null);
+    } catch (error) {
+      console.error(`Failed to fetch older messages of ${sessionId}:`, error);
+    }
+  }, [isAuthenticated, sessionId, olderMessagesCursor]);
+
   // Load session data when sessionId changes
   useEffect(() => {
     if (sessionId) {
       fetchSession(sessionId);
     } else {
       setMessages([]);
+      setOlderMessagesCursor(null);
     }
   }, [sessionId, fetchSession]);
 
@@ -362,6 +408,10 @@ export function useChat(initialSessionId?: number) {
     renameSession,
     fetchSessions,
     fetchSession,
+    hasMoreSessions: sessionsCursor !== null,
+    loadMoreSessions,
+    hasOlderMessages: olderMessagesCursor !== null,
+    loadOlderMessages,
     toggleSearchMode: () => setIsSearchMode((prev) => !prev),
   };
 }
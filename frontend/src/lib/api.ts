@@ -145,8 +145,14 @@ api.interceptors.response.use(
 // API endpoints
 export const chatApi = {
   // Chat sessions
-  getChatSessions: () => api.get("/chat/sessions"),
-  getChatSession: (sessionId: number) => api.get(`/chat/sessions/${sessionId}`),
+  // Paginated: pass the X-Next-Cursor response header as `cursor` for the next page
+  getChatSessions: (params?: { limit?: number; cursor?: string }) =>
+    api.get("/chat/sessions", { params }),
+  // Returns the latest messages; pass `next_cursor` as `before` to load older ones
+  getChatSession: (
+    sessionId: number,
+    params?: { limit?: number; before?: string }
+  ) => api.get(`/chat/sessions/${sessionId}`, { params }),
   createChatSession: (data: { name: string }) =>
     api.post("/chat/sessions", data),
   updateChatSession: (sessionId: number, data: { name: string }) =>
@@ -33,6 +33,8 @@ function ChatSessionPage() {
     switchSession,
     isSearchMode,
     toggleSearchMode,
+    hasOlderMessages,
+    loadOlderMessages,
   } = useChat();
 
   const { isAuthenticated, isLoading: authLoading } = useAuth();
@@ -75,6 +77,8 @@ function ChatSessionPage() {
           sessionId={sessionIdNum}
           isSearchMode={isSearchMode}
           toggleSearchMode={toggleSearchMode}
+          hasOlderMessages={hasOlderMessages}
+          onLoadOlderMessages={loadOlderMessages}
         />
       </div>
     </Layout>
@@ -19,6 +19,7 @@ export interface ChatSession {
   name: string;
   created_at: string;
   message_count?: number;
+  last_message_at?: string | null;
   messages?: ChatMessage[];
 }
 